@@ -0,0 +1,28 @@
+import argparse
+from datetime import datetime
+
+from face_attendance_system import BATCH_SAMPLE_FPS, SimpleFaceRecognitionSystem
+
+def main():
+    parser = argparse.ArgumentParser(description="Mark attendance from a recorded lecture or snapshot folder")
+    parser.add_argument('source', help="video file or folder of snapshot images")
+    parser.add_argument('--sample-fps', type=float, default=BATCH_SAMPLE_FPS,
+                        help="video frames analysed per second of footage")
+    parser.add_argument('--start-time', type=datetime.fromisoformat,
+                        help="wall-clock time of the first video frame (default: from the file's mtime)")
+    parser.add_argument('--workers', type=int, help="recognition processes (default: all cores)")
+    args = parser.parse_args()
+
+    face_system = SimpleFaceRecognitionSystem()
+    summary = face_system.process_recording_for_attendance(
+        args.source, sample_fps=args.sample_fps, start_time=args.start_time, workers=args.workers
+    )
+
+    print(f"Analysed {summary['frames']} frames, {summary['faces']} faces, "
+          f"{len(summary['events'])} students marked")
+    print("-" * 50)
+    for event in summary['events']:
+        print(f"{event['check_in']} | {event['student_id']} | {event['name']}")
+
+if __name__ == "__main__":
+    main()
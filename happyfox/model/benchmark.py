@@ -0,0 +1,279 @@
+import argparse
+import json
+import os
+import platform
+import random
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+import cv2
+import numpy as np
+
+import face_attendance_system
+from face_attendance_system import (DatabaseHandler, SimpleFaceRecognitionSystem,
+                                    SCHEMA_VERSION_FACE_SAMPLES, normalize_face)
+from recognizers import create_recognizer
+from synthetic_faces import classroom_frame, drawn_face, synthetic_face
+
+BENCHMARK_STUDENTS = 2000
+LOOKUP_REPEATS = 200
+LEGACY_LOOKUP_REPEATS = 20
+RECOGNIZER_PROBES = 200
+FRAME_FACE_COUNTS = (1, 10, 40)
+FRAME_REPEATS = 10
+MARK_EVENTS = 5000
+REPORT_REPEATS = 5
+
+def create_synthetic_database(db_path, students, days, start_day=date(2020, 1, 1)):
+    """Synthetic attendance.db with drawn-face students, stored samples and `days` of attendance"""
+    db = DatabaseHandler(db_path)
+    for identity in range(1, students + 1):
+        face = drawn_face(identity)
+        _, encoded = cv2.imencode('.jpg', face)
+        db.cursor.execute("""
+            INSERT INTO students (name, email, face_image) VALUES (?, ?, ?)
+        """, (f"Student {identity}", f"student{identity}@example.com", encoded.tobytes()))
+        db.add_face_sample(db.cursor.lastrowid, normalize_face(face))
+    # Samples are already stored, so startup skips the photo backfill
+    db.set_schema_version(SCHEMA_VERSION_FACE_SAMPLES)
+    db.conn.commit()
+
+    last_day = populate_attendance(db, students * days, students, start_day)
+    db.conn.close()
+    return last_day
+
+def populate_attendance(db, target_rows, students=BENCHMARK_STUDENTS, start_day=date(2020, 1, 1)):
+    """Grow the attendance table to target_rows, one row per student per day"""
+    db.cursor.execute("SELECT COUNT(*) FROM attendance")
+    existing = db.cursor.fetchone()[0]
+
+    def rows():
+        for index in range(existing, target_rows):
+            day = start_day + timedelta(days=index // students)
+            student_id = index % students + 1
+            check_in = f"{day} 0{8 + index % 2}:{index % 60:02d}:00"
+            yield (student_id, check_in, None, day.isoformat())
+
+    db.cursor.executemany("""
+        INSERT INTO attendance (student_id, check_in, check_out, attendance_date)
+        VALUES (?, ?, ?, ?)
+    """, rows())
+    db.conn.commit()
+
+    return start_day + timedelta(days=max(target_rows - 1, 0) // students)
+
+def time_queries(cursor, query, param_sets):
+    """Return the mean seconds per query over the given parameter sets"""
+    started = time.perf_counter()
+    for params in param_sets:
+        cursor.execute(query, params).fetchall()
+    return (time.perf_counter() - started) / len(param_sets)
+
+def benchmark_attendance_lookup(sizes, students=BENCHMARK_STUDENTS):
+    """Time per-student-per-day lookups and UPSERT check-ins as attendance grows"""
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        db = DatabaseHandler(os.path.join(workdir, 'benchmark.db'))
+        start_day = date(2020, 1, 1)
+
+        for size in sorted(sizes):
+            last_day = populate_attendance(db, size, students, start_day)
+            days = max((last_day - start_day).days, 1)
+            rng = random.Random(size)
+
+            def random_keys(count):
+                return [
+                    (rng.randint(1, students),
+                     (start_day + timedelta(days=rng.randint(0, days - 1))).isoformat())
+                    for _ in range(count)
+                ]
+
+            indexed = time_queries(db.cursor, """
+                SELECT attendance_id, check_in, check_out FROM attendance
+                WHERE student_id = ? AND attendance_date = ?
+            """, random_keys(LOOKUP_REPEATS))
+
+            # The pre-migration predicate wraps the column in date() and cannot use an index
+            legacy = time_queries(db.cursor, """
+                SELECT attendance_id, check_in, check_out FROM attendance
+                WHERE student_id = ? AND date(attendance_date) = date(?)
+            """, random_keys(LEGACY_LOOKUP_REPEATS))
+
+            # Check-ins on a day past the populated range, rolled back afterwards
+            future_day = (last_day + timedelta(days=1)).isoformat()
+            started = time.perf_counter()
+            for student_id in range(1, LOOKUP_REPEATS + 1):
+                db.cursor.execute("""
+                    INSERT INTO attendance (student_id, check_in, attendance_date)
+                    VALUES (?, ?, ?)
+                    ON CONFLICT (student_id, attendance_date) DO UPDATE
+                    SET check_out = excluded.check_in
+                    WHERE attendance.check_out IS NULL
+                """, (student_id, f"{future_day} 09:00:00", future_day))
+            upsert = (time.perf_counter() - started) / LOOKUP_REPEATS
+            db.conn.rollback()
+
+            results.append({
+                'rows': size,
+                'indexed_lookup_us': indexed * 1e6,
+                'legacy_lookup_us': legacy * 1e6,
+                'upsert_us': upsert * 1e6
+            })
+            print(f"{size:>10} rows | indexed {indexed * 1e6:9.1f} us | "
+                  f"legacy {legacy * 1e6:11.1f} us | upsert {upsert * 1e6:9.1f} us")
+
+        db.conn.close()
+    return results
+
+def benchmark_recognizers(sizes, probes=RECOGNIZER_PROBES):
+    """Compare LBPH with the histogram gallery: label parity, accuracy and predict latency"""
+    results = []
+    for size in sorted(sizes):
+        rng = np.random.default_rng(size)
+        labels = list(range(1, size + 1))
+        gallery_faces = [synthetic_face(label, rng) for label in labels]
+        probe_labels = rng.choice(labels, size=min(probes, size), replace=False).tolist()
+        probe_faces = [synthetic_face(label, rng) for label in probe_labels]
+
+        row = {'students': size, 'probes': len(probe_faces)}
+        predictions = {}
+        for backend in ('lbph', 'gallery'):
+            recognizer = create_recognizer(backend)
+            started = time.perf_counter()
+            recognizer.train(gallery_faces, labels)
+            row[f'{backend}_train_s'] = time.perf_counter() - started
+
+            # One face per call, as the webcam path used to do
+            single_probes = probe_faces[:20]
+            started = time.perf_counter()
+            for face in single_probes:
+                recognizer.predict([face])
+            row[f'{backend}_single_ms'] = (
+                (time.perf_counter() - started) / len(single_probes) * 1e3
+            )
+
+            started = time.perf_counter()
+            predicted = [label for label, _ in recognizer.predict(probe_faces)]
+            row[f'{backend}_batch_ms_per_face'] = (
+                (time.perf_counter() - started) / len(probe_faces) * 1e3
+            )
+
+            predictions[backend] = predicted
+            row[f'{backend}_accuracy'] = float(np.mean(np.array(predicted) == probe_labels))
+
+        row['label_parity'] = float(np.mean(
+            np.array(predictions['lbph']) == np.array(predictions['gallery'])
+        ))
+        results.append(row)
+        print(f"{size:>6} students | lbph {row['lbph_single_ms']:8.2f} ms/face | "
+              f"gallery {row['gallery_single_ms']:7.2f} ms single, "
+              f"{row['gallery_batch_ms_per_face']:7.3f} ms/face batched | "
+              f"parity {row['label_parity']:.3f}")
+    return results
+
+def time_mean(function, repeats):
+    """Mean seconds per call"""
+    started = time.perf_counter()
+    for _ in range(repeats):
+        function()
+    return (time.perf_counter() - started) / repeats
+
+def benchmark_system(sizes, days, backend=face_attendance_system.RECOGNIZER_BACKEND):
+    """Time SimpleFaceRecognitionSystem startup, frames, check-ins and reports per roster size"""
+    results = []
+    original_dir = os.getcwd()
+    for size in sorted(sizes):
+        with tempfile.TemporaryDirectory() as workdir:
+            # The system keeps its database and snapshots in the working directory
+            os.chdir(workdir)
+            try:
+                row = {'students': size, 'days': days, 'backend': backend}
+                started = time.perf_counter()
+                last_day = create_synthetic_database(face_attendance_system.DATABASE_PATH, size, days)
+                row['setup_s'] = time.perf_counter() - started
+
+                started = time.perf_counter()
+                system = SimpleFaceRecognitionSystem(recognizer_backend=backend)
+                row['startup_cold_s'] = time.perf_counter() - started
+                row['load_snapshot_s'] = time_mean(system.load_registered_faces, 1)
+                os.remove(system.face_recognizer.snapshot_path)
+                row['load_full_s'] = time_mean(system.load_registered_faces, 1)
+
+                for count in FRAME_FACE_COUNTS:
+                    frame = classroom_frame([identity % size + 1 for identity in range(count)])
+                    row[f'frame_{count}_faces_ms'] = time_mean(
+                        lambda: system.process_image_for_attendance(frame.copy(), is_webcam=True),
+                        FRAME_REPEATS
+                    ) * 1e3
+
+                # Check-ins on days past the populated range, committed by the writer
+                system.attendance_writer.flush()
+                started = time.perf_counter()
+                for index in range(MARK_EVENTS):
+                    day = last_day + timedelta(days=1 + index // size)
+                    system.mark_attendance(index % size + 1, datetime(day.year, day.month, day.day, 9))
+                system.attendance_writer.flush()
+                row['mark_attendance_per_s'] = MARK_EVENTS / (time.perf_counter() - started)
+
+                for report_type in ('Daily', 'Weekly', 'Monthly'):
+                    row[f'report_{report_type.lower()}_ms'] = time_mean(
+                        lambda: system.get_attendance_report(last_day.isoformat(), report_type),
+                        REPORT_REPEATS
+                    ) * 1e3
+
+                system.attendance_writer.close()
+            finally:
+                os.chdir(original_dir)
+
+        results.append(row)
+        print(f"{size:>6} students | startup {row['startup_cold_s']:7.2f} s | "
+              f"frame 1/10/40 faces " +
+              "/".join(f"{row[f'frame_{count}_faces_ms']:.0f}" for count in FRAME_FACE_COUNTS) +
+              f" ms | {row['mark_attendance_per_s']:8.0f} check-ins/s | "
+              f"daily report {row['report_daily_ms']:7.1f} ms")
+    return results
+
+def environment():
+    """Versions recorded next to the results so runs can be compared"""
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+        'machine': platform.machine(),
+        'cpus': os.cpu_count()
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Face attendance benchmarks")
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[10_000, 100_000, 1_000_000, 3_000_000],
+                        help="attendance table sizes to measure")
+    parser.add_argument('--roster-sizes', type=int, nargs='+', default=[100, 1000, 10000],
+                        help="gallery sizes for the recognizer comparison")
+    parser.add_argument('--system-sizes', type=int, nargs='+', default=[100, 1000, 5000],
+                        help="roster sizes for the end-to-end system benchmark")
+    parser.add_argument('--days', type=int, default=90,
+                        help="days of attendance in the synthetic system database")
+    parser.add_argument('--backend', default=face_attendance_system.RECOGNIZER_BACKEND,
+                        help="recognizer backend for the system benchmark")
+    parser.add_argument('--suites', nargs='+', default=['lookup', 'recognizers', 'system'],
+                        choices=['lookup', 'recognizers', 'system'],
+                        help="benchmarks to run")
+    parser.add_argument('--output', help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = {'environment': environment()}
+    if 'lookup' in args.suites:
+        results['attendance_lookup'] = benchmark_attendance_lookup(args.sizes)
+    if 'recognizers' in args.suites:
+        results['recognizers'] = benchmark_recognizers(args.roster_sizes)
+    if 'system' in args.suites:
+        results['system'] = benchmark_system(args.system_sizes, args.days, args.backend)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
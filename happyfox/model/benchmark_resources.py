@@ -0,0 +1,253 @@
+import argparse
+import json
+import threading
+import time
+
+import numpy as np
+
+from embedding_batcher import BATCH_MAX_SIZE, BATCH_MAX_WAIT, MicroBatcher
+from embedding_index import (
+    EMBEDDING_STORAGE_CODES, EmbeddingIndex, IVFIndex, decode_embedding, encode_embedding,
+    normalize_rows
+)
+
+EMBEDDING_DIM = 768
+BENCHMARK_TOPICS = 500
+BENCHMARK_QUERIES = 200
+BENCHMARK_NOISE = 2.0  # per-item spread around its topic, relative to the topic vector
+RECALL_K = 10
+BENCHMARK_MODEL_ID = 'benchmark'
+
+# Stand-in encoder for machines without torch: token embeddings through a stack
+# of attention and feed-forward layers at BERT-base width, so per-call overhead and
+# padding cost behave roughly like the real model
+SYNTHETIC_LAYERS = 12
+SYNTHETIC_VOCAB = 30522
+BENCHMARK_WORDS = ['calculus', 'textbook', 'notes', 'physics', 'lab', 'coat', 'arduino',
+                   'kit', 'used', 'chemistry', 'graph', 'paper', 'calculator', 'laptop',
+                   'charger', 'novel', 'history', 'semester', 'lecture', 'slides']
+
+def synthetic_catalog(size, dim=EMBEDDING_DIM, topics=BENCHMARK_TOPICS, seed=0):
+    """Clustered unit vectors standing in for BERT embeddings of a resource catalog"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(topics, dim)).astype(np.float32)
+    members = rng.integers(0, topics, size)
+    vectors = centers[members] + rng.normal(scale=BENCHMARK_NOISE, size=(size, dim)).astype(np.float32)
+    return normalize_rows(vectors), centers
+
+def synthetic_queries(centers, count, seed=1):
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(centers), count)
+    return normalize_rows(centers[picks] + rng.normal(scale=BENCHMARK_NOISE, size=(count, centers.shape[1])))
+
+def benchmark_ann(sizes, nprobes, k=RECALL_K, queries=BENCHMARK_QUERIES):
+    """Exact vs IVF search latency and recall@k over synthetic catalogs"""
+    results = []
+    for size in sorted(sizes):
+        vectors, centers = synthetic_catalog(size)
+        ids = np.arange(1, size + 1)
+        probes = synthetic_queries(centers, queries)
+
+        exact = EmbeddingIndex()
+        for resource_id, vector in zip(ids, vectors):
+            exact.add(int(resource_id), vector)
+        started = time.perf_counter()
+        truth = [{resource_id for resource_id, _ in exact.search(query, k)} for query in probes]
+        row = {'resources': size, 'k': k,
+               'exact_ms': (time.perf_counter() - started) / queries * 1e3}
+
+        started = time.perf_counter()
+        index = IVFIndex.build(ids, vectors)
+        row['ivf_build_s'] = time.perf_counter() - started
+        row['ivf_lists'] = len(index.centroids)
+
+        row['ivf'] = []
+        for nprobe in nprobes:
+            index.nprobe = nprobe
+            started = time.perf_counter()
+            found = [{resource_id for resource_id, _ in index.search(query, k)} for query in probes]
+            latency = (time.perf_counter() - started) / queries * 1e3
+            recall = np.mean([len(f & t) / len(t) for f, t in zip(found, truth)])
+            row['ivf'].append({'nprobe': nprobe, 'ms': latency, 'recall': float(recall)})
+            print(f"{size:>8} resources | exact {row['exact_ms']:7.2f} ms | "
+                  f"ivf nprobe {nprobe:>3} {latency:7.2f} ms recall@{k} {recall:.3f}")
+        results.append(row)
+    return results
+
+def benchmark_quantization(sizes, storages, k=RECALL_K, queries=BENCHMARK_QUERIES):
+    """Stored size, resident memory, latency and accuracy of each embedding storage
+
+    Vectors round-trip through encode_embedding()/decode_embedding() before
+    indexing, so the accuracy delta covers both the stored and resident forms.
+    Recall and similarity error are measured against float32.
+    """
+    results = []
+    for size in sorted(sizes):
+        vectors, centers = synthetic_catalog(size)
+        probes = synthetic_queries(centers, queries)
+        truth = None
+        for storage in storages:
+            encoded = [encode_embedding(vector, BENCHMARK_MODEL_ID, storage) for vector in vectors]
+            index = EmbeddingIndex(storage)
+            for resource_id, blob in enumerate(encoded, 1):
+                index.add(resource_id, decode_embedding(blob, BENCHMARK_MODEL_ID))
+
+            started = time.perf_counter()
+            found = [index.search(query, k) for query in probes]
+            latency = (time.perf_counter() - started) / queries * 1e3
+            if truth is None:
+                truth = found
+
+            recall = np.mean([
+                len({i for i, _ in f} & {i for i, _ in t}) / len(t) for f, t in zip(found, truth)
+            ])
+            exact = vectors @ probes.T
+            errors = np.concatenate([
+                [abs(similarity - exact[resource_id - 1, q]) for resource_id, similarity in f]
+                for q, f in enumerate(found)
+            ])
+            row = {
+                'resources': size, 'storage': storage, 'k': k,
+                'stored_bytes': len(encoded[0]),
+                'resident_mb': index.nbytes / 2**20,
+                'search_ms': latency,
+                'recall_vs_float32': float(recall),
+                'mean_similarity_error': float(errors.mean()),
+                'max_similarity_error': float(errors.max())
+            }
+            print(f"{size:>8} resources | {storage:>7} | {row['stored_bytes']:>5} B/vector | "
+                  f"{row['resident_mb']:8.1f} MB | {latency:6.2f} ms | recall@{k} {recall:.3f} | "
+                  f"sim err {row['mean_similarity_error']:.5f} (max {row['max_similarity_error']:.5f})")
+            results.append(row)
+    return results
+
+def synthetic_embedder(dim=EMBEDDING_DIM, layers=SYNTHETIC_LAYERS, seed=0):
+    """embed_batch() for a NumPy stand-in encoder with BERT's width and padding"""
+    rng = np.random.default_rng(seed)
+    table = rng.normal(size=(SYNTHETIC_VOCAB, dim)).astype(np.float32)
+    weights = [
+        (rng.normal(scale=dim ** -0.5, size=(dim, 4 * dim)).astype(np.float32),
+         rng.normal(scale=(4 * dim) ** -0.5, size=(4 * dim, dim)).astype(np.float32))
+        for _ in range(layers)
+    ]
+
+    def embed_batch(texts):
+        tokens = [[hash(word) % SYNTHETIC_VOCAB for word in text.split()][:128] for text in texts]
+        length = max(len(row) for row in tokens)
+        ids = np.zeros((len(texts), length), dtype=np.int64)
+        mask = np.zeros((len(texts), length, 1), dtype=np.float32)
+        for row, row_tokens in enumerate(tokens):
+            ids[row, :len(row_tokens)] = row_tokens
+            mask[row, :len(row_tokens)] = 1.0
+        hidden = table[ids]
+        for expand, project in weights:
+            # Self-attention over the padded sequence, then the feed-forward block
+            scores = hidden @ hidden.transpose(0, 2, 1) / np.sqrt(dim)
+            scores = np.exp(scores - scores.max(axis=2, keepdims=True))
+            hidden = hidden + (scores / scores.sum(axis=2, keepdims=True)) @ hidden
+            hidden = hidden + np.maximum(hidden @ expand, 0) @ project
+            hidden /= np.linalg.norm(hidden, axis=2, keepdims=True)
+        return (hidden * mask).sum(axis=1) / mask.sum(axis=1)
+    return embed_batch
+
+def bert_embedder():
+    """embed_batch() running bert-base-uncased the way ResourceMatcher does"""
+    import torch
+    from transformers import BertModel, BertTokenizer
+    tokenizer = BertTokenizer.from_pretrained('bert-base-uncased')
+    model = BertModel.from_pretrained('bert-base-uncased')
+    model.eval()
+
+    def embed_batch(texts):
+        inputs = tokenizer(list(texts), return_tensors="pt", padding=True, truncation=True, max_length=128)
+        with torch.no_grad():
+            hidden = model(**inputs).last_hidden_state
+            mask = inputs['attention_mask'].unsqueeze(-1).to(hidden.dtype)
+            return ((hidden * mask).sum(dim=1) / mask.sum(dim=1)).numpy()
+    return embed_batch
+
+def search_texts(count, seed=2):
+    rng = np.random.default_rng(seed)
+    return [' '.join(rng.choice(BENCHMARK_WORDS, rng.integers(4, 16))) for _ in range(count)]
+
+def run_clients(embed, clients, requests_per_client):
+    """Per-request latencies and wall time with `clients` threads calling embed()"""
+    texts = search_texts(clients * requests_per_client)
+    latencies = [[] for _ in range(clients)]
+
+    def client(number):
+        for text in texts[number::clients]:
+            started = time.perf_counter()
+            embed(text)
+            latencies[number].append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=client, args=(number,)) for number in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return np.concatenate(latencies), time.perf_counter() - started
+
+def benchmark_batching(clients_list, embed_batch, requests_per_client=20,
+                       max_batch_size=BATCH_MAX_SIZE, max_wait=BATCH_MAX_WAIT):
+    """Throughput and latency of one-pass-per-request vs micro-batched embedding"""
+    embed_batch(search_texts(2))  # warm up
+    results = []
+    for clients in clients_list:
+        batcher = MicroBatcher(embed_batch, max_batch_size, max_wait)
+        modes = [('unbatched', lambda text: embed_batch([text])[0]), ('batched', batcher.embed)]
+        for mode, embed in modes:
+            latencies, elapsed = run_clients(embed, clients, requests_per_client)
+            row = {
+                'clients': clients, 'mode': mode,
+                'requests_per_s': len(latencies) / elapsed,
+                'p50_ms': float(np.percentile(latencies, 50) * 1e3),
+                'p95_ms': float(np.percentile(latencies, 95) * 1e3)
+            }
+            if mode == 'batched':
+                row['mean_batch_size'] = batcher.stats()['mean_batch_size']
+            print(f"{clients:>3} clients | {mode:>9} | {row['requests_per_s']:8.1f} req/s | "
+                  f"p50 {row['p50_ms']:7.2f} ms | p95 {row['p95_ms']:7.2f} ms"
+                  + (f" | batch {row['mean_batch_size']:.1f}" if mode == 'batched' else ''))
+            results.append(row)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Resource search benchmarks")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000],
+                        help="catalog sizes for the ANN comparison")
+    parser.add_argument('--nprobes', type=int, nargs='+', default=[1, 4, 8, 16, 32],
+                        help="IVF lists scanned per query")
+    parser.add_argument('--storages', nargs='+', default=list(EMBEDDING_STORAGE_CODES),
+                        choices=list(EMBEDDING_STORAGE_CODES),
+                        help="embedding storage formats to compare; the first is the reference")
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 8, 32],
+                        help="concurrent clients for the batching benchmark")
+    parser.add_argument('--requests', type=int, default=20, help="requests per client")
+    parser.add_argument('--max-batch', type=int, default=BATCH_MAX_SIZE)
+    parser.add_argument('--max-wait-ms', type=float, default=BATCH_MAX_WAIT * 1e3)
+    parser.add_argument('--embedder', choices=['synthetic', 'bert'], default='synthetic',
+                        help="bert needs torch and transformers")
+    parser.add_argument('--suites', nargs='+', default=['ann', 'quantization', 'batching'],
+                        choices=['ann', 'quantization', 'batching'])
+    parser.add_argument('--output', help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = {}
+    if 'ann' in args.suites:
+        results['ann'] = benchmark_ann(args.sizes, args.nprobes)
+    if 'quantization' in args.suites:
+        results['quantization'] = benchmark_quantization(args.sizes, args.storages)
+    if 'batching' in args.suites:
+        embed_batch = bert_embedder() if args.embedder == 'bert' else synthetic_embedder()
+        results['batching'] = benchmark_batching(
+            args.clients, embed_batch, args.requests, args.max_batch, args.max_wait_ms / 1e3
+        )
+        results['batching_embedder'] = args.embedder
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
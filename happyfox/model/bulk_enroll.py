@@ -0,0 +1,25 @@
+import argparse
+import csv
+
+from face_attendance_system import SimpleFaceRecognitionSystem, format_enrollment_report
+
+def main():
+    parser = argparse.ArgumentParser(description="Enroll a roster of students in one pass")
+    parser.add_argument('photos', help="folder or zip archive of student photos")
+    parser.add_argument('roster', help="CSV roster with name, email and photo columns")
+    parser.add_argument('--workers', type=int, help="face detection processes (default: all cores)")
+    parser.add_argument('--report', help="write the per-file results to this CSV file")
+    args = parser.parse_args()
+
+    face_system = SimpleFaceRecognitionSystem()
+    results = face_system.bulk_register_students(args.photos, args.roster, workers=args.workers)
+    print(format_enrollment_report(results))
+
+    if args.report:
+        with open(args.report, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=['photo', 'name', 'status', 'detail'])
+            writer.writeheader()
+            writer.writerows(results)
+
+if __name__ == "__main__":
+    main()
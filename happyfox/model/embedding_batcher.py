@@ -0,0 +1,86 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+# Largest batch one forward pass takes, and how long the first request of a
+# batch waits for company before the batch runs anyway
+BATCH_MAX_SIZE = 32
+BATCH_MAX_WAIT = 0.005  # seconds
+
+class MicroBatcher:
+    """Coalesces concurrent single-item requests into batched calls
+
+    embed_batch(items) must return one result row per item. Callers block in
+    embed() while a background thread gathers requests until max_batch_size
+    items are waiting or max_wait has passed since the oldest arrived, then
+    runs them through one embed_batch() call and hands each caller its row.
+    """
+
+    def __init__(self, embed_batch, max_batch_size=BATCH_MAX_SIZE, max_wait=BATCH_MAX_WAIT):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.embed_batch = embed_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.condition = threading.Condition()
+        self.pending = deque()  # (item, future, arrival time)
+        self.batches = 0
+        self.items = 0
+        self.thread = threading.Thread(target=self.run, name='embedding-batcher', daemon=True)
+        self.thread.start()
+
+    def submit(self, item) -> Future:
+        future = Future()
+        with self.condition:
+            self.pending.append((item, future, time.monotonic()))
+            self.condition.notify()
+        return future
+
+    def embed(self, item):
+        """Result row for one item, computed as part of a batch"""
+        return self.submit(item).result()
+
+    def next_batch(self):
+        with self.condition:
+            while not self.pending:
+                self.condition.wait()
+
+            # Wait out the oldest request's window unless the batch fills first
+            deadline = self.pending[0][2] + self.max_wait
+            while len(self.pending) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.condition.wait(remaining)
+
+            count = min(len(self.pending), self.max_batch_size)
+            return [self.pending.popleft() for _ in range(count)]
+
+    def run(self):
+        while True:
+            batch = self.next_batch()
+            futures = [future for _, future, _ in batch]
+            try:
+                rows = self.embed_batch([item for item, _, _ in batch])
+                if len(rows) != len(batch):
+                    raise ValueError(f"embed_batch returned {len(rows)} rows for {len(batch)} items")
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+
+            for future, row in zip(futures, rows):
+                future.set_result(row)
+            with self.condition:
+                self.batches += 1
+                self.items += len(batch)
+
+    def stats(self):
+        """Batches run, items embedded and the mean batch size"""
+        with self.condition:
+            return {
+                'batches': self.batches,
+                'items': self.items,
+                'mean_batch_size': self.items / self.batches if self.batches else 0.0
+            }
@@ -0,0 +1,380 @@
+import struct
+import threading
+from typing import List, Tuple
+
+import numpy as np
+
+# Stored embedding layout: header (magic, format version, dtype, dim, norm, int8
+# scale, model id length), the model id, then the unit vector's codes
+EMBEDDING_MAGIC = b'EMB'
+EMBEDDING_FORMAT_VERSION = 1
+EMBEDDING_STORAGE_CODES = {'float32': 0, 'float16': 1, 'int8': 2}
+EMBEDDING_HEADER = struct.Struct('<3sBBHffB')
+
+INDEX_SCAN_BLOCK = 8192  # rows dequantized at a time when scoring a compact index
+
+# IVF: lists per sqrt(catalog size), lists scanned per query (the recall/latency
+# knob), and k-means training effort
+IVF_LISTS_PER_SQRT = 1.0
+IVF_NPROBE = 8
+IVF_KMEANS_ITERATIONS = 10
+IVF_TRAIN_SAMPLE = 20000
+IVF_ASSIGN_BLOCK = 4096  # vectors per block when assigning to centroids
+IVF_COMPACT_FRACTION = 0.2  # tombstoned share of rows that triggers compaction
+
+def normalize_rows(vectors):
+    """Float32 copy of vectors (one per row) scaled to unit L2 norm"""
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    return vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12)
+
+def quantize(vectors, storage):
+    """Codes and per-row scales for normalized vectors stored as float32, float16 or int8"""
+    if storage not in EMBEDDING_STORAGE_CODES:
+        raise ValueError(f"Unknown embedding storage: {storage}")
+    scales = np.ones(len(vectors), dtype=np.float32)
+    if storage == 'float32':
+        return vectors.astype(np.float32), scales
+    if storage == 'float16':
+        return vectors.astype(np.float16), scales
+
+    # Symmetric per-vector int8 scalar quantization
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+def encode_embedding(vector, model_id: str, storage='float32') -> bytes:
+    """Self-describing bytes for one embedding: header, model id and quantized unit vector"""
+    vector = np.asarray(vector, dtype=np.float32).ravel()
+    norm = float(np.linalg.norm(vector))
+    codes, scales = quantize(vector[None, :] / (norm + 1e-12), storage)
+    model = model_id.encode('utf-8')
+    header = EMBEDDING_HEADER.pack(
+        EMBEDDING_MAGIC, EMBEDDING_FORMAT_VERSION, EMBEDDING_STORAGE_CODES[storage],
+        len(vector), norm, float(scales[0]), len(model)
+    )
+    return header + model + codes.tobytes()
+
+def decode_embedding(blob, model_id: str = None):
+    """Float32 vector from encode_embedding() bytes
+
+    Raises ValueError for unversioned or truncated data, an unknown format
+    version, or an embedding made by a different model than model_id.
+    """
+    blob = bytes(blob)
+    if len(blob) < EMBEDDING_HEADER.size or not blob.startswith(EMBEDDING_MAGIC):
+        raise ValueError("Not a versioned embedding")
+    _, version, storage_code, dim, norm, scale, model_length = EMBEDDING_HEADER.unpack_from(blob)
+    if version != EMBEDDING_FORMAT_VERSION:
+        raise ValueError(f"Unsupported embedding format version: {version}")
+
+    offset = EMBEDDING_HEADER.size
+    model = blob[offset:offset + model_length].decode('utf-8')
+    if model_id is not None and model != model_id:
+        raise ValueError(f"Embedding was made by {model}, expected {model_id}")
+
+    storage = {code: name for name, code in EMBEDDING_STORAGE_CODES.items()}.get(storage_code)
+    if storage is None:
+        raise ValueError(f"Unknown embedding storage code: {storage_code}")
+    offset += model_length
+    if len(blob) != offset + dim * np.dtype(storage).itemsize:
+        raise ValueError("Truncated embedding")
+    codes = np.frombuffer(blob, dtype=storage, count=dim, offset=offset)
+    return codes.astype(np.float32) * np.float32(scale * norm)
+
+def top_k(ids, similarities, k, threshold=None) -> List[Tuple[int, float]]:
+    """The k highest-scoring (id, similarity) pairs, best first, above an optional threshold"""
+    k = min(k, len(similarities))
+    if k <= 0:
+        return []
+    top = np.argpartition(-similarities, k - 1)[:k]
+    top = top[np.argsort(-similarities[top])]
+    return [
+        (int(ids[row]), float(similarities[row])) for row in top
+        if threshold is None or similarities[row] > threshold
+    ]
+
+def nearest_centroids(vectors, centroids, block=IVF_ASSIGN_BLOCK):
+    """Index of the most similar centroid for each normalized vector"""
+    assignments = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), block):
+        scores = vectors[start:start + block] @ centroids.T
+        assignments[start:start + block] = scores.argmax(axis=1)
+    return assignments
+
+def spherical_kmeans(vectors, n_clusters, iterations=IVF_KMEANS_ITERATIONS,
+                     sample=IVF_TRAIN_SAMPLE, seed=0):
+    """Unit-norm k-means centroids trained on a sample of normalized vectors"""
+    rng = np.random.default_rng(seed)
+    if len(vectors) > sample:
+        vectors = vectors[rng.choice(len(vectors), sample, replace=False)]
+    n_clusters = max(1, min(n_clusters, len(vectors)))
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignments = nearest_centroids(vectors, centroids)
+        counts = np.bincount(assignments, minlength=n_clusters)
+
+        # Sum each cluster's members with one sort instead of a per-cluster loop
+        order = np.argsort(assignments, kind='stable')
+        occupied = np.flatnonzero(counts)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[occupied]
+        sums = np.zeros_like(centroids)
+        sums[occupied] = np.add.reduceat(vectors[order], starts, axis=0)
+
+        # Empty clusters are reseeded from random training vectors
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            sums[empty] = vectors[rng.choice(len(vectors), len(empty), replace=False)]
+        centroids = normalize_rows(sums)
+    return centroids
+
+class EmbeddingIndex:
+    """Resident L2-normalized embedding matrix with a parallel resource id array
+
+    Searching is one matrix-vector product plus argpartition. Rows are appended
+    with geometric growth and removed by moving the last row into the gap.
+    With float16 or int8 storage the matrix takes 2x or 4x less memory and is
+    dequantized block by block while scoring.
+    """
+
+    def __init__(self, storage='float32'):
+        if storage not in EMBEDDING_STORAGE_CODES:
+            raise ValueError(f"Unknown embedding storage: {storage}")
+        self.storage = storage
+        self.lock = threading.Lock()
+        self.vectors = None
+        self.scales = np.empty(0, dtype=np.float32)
+        self.ids = np.empty(0, dtype=np.int64)
+        self.rows = {}  # resource_id -> row
+        self.size = 0
+
+    @property
+    def nbytes(self):
+        """Resident bytes of the stored vectors and their scales"""
+        if self.vectors is None:
+            return 0
+        return self.size * (self.vectors.shape[1] * self.vectors.itemsize + self.scales.itemsize)
+
+    def add(self, resource_id: int, embedding):
+        codes, scales = quantize(normalize_rows(embedding), self.storage)
+
+        with self.lock:
+            if resource_id in self.rows:
+                self.vectors[self.rows[resource_id]] = codes[0]
+                self.scales[self.rows[resource_id]] = scales[0]
+                return
+
+            if self.vectors is None:
+                self.vectors = np.empty((0, codes.shape[1]), dtype=codes.dtype)
+            if self.size == len(self.vectors):
+                capacity = max(64, 2 * len(self.vectors))
+                vectors = np.empty((capacity, self.vectors.shape[1]), dtype=self.vectors.dtype)
+                vectors[:self.size] = self.vectors[:self.size]
+                scale_store = np.empty(capacity, dtype=np.float32)
+                scale_store[:self.size] = self.scales[:self.size]
+                ids = np.empty(capacity, dtype=np.int64)
+                ids[:self.size] = self.ids[:self.size]
+                self.vectors, self.scales, self.ids = vectors, scale_store, ids
+
+            self.vectors[self.size] = codes[0]
+            self.scales[self.size] = scales[0]
+            self.ids[self.size] = resource_id
+            self.rows[resource_id] = self.size
+            self.size += 1
+
+    def dense(self):
+        """Return (ids, float32 vectors) for every row"""
+        with self.lock:
+            vectors = self.vectors[:self.size].astype(np.float32) * self.scales[:self.size, None]
+            return self.ids[:self.size].copy(), vectors
+
+    def remove(self, resource_id: int):
+        with self.lock:
+            row = self.rows.pop(resource_id, None)
+            if row is None:
+                return
+            last = self.size - 1
+            if row != last:
+                self.vectors[row] = self.vectors[last]
+                self.scales[row] = self.scales[last]
+                self.ids[row] = self.ids[last]
+                self.rows[int(self.ids[row])] = row
+            self.size = last
+
+    def search(self, query, k: int, threshold: float = None):
+        """Return [(resource_id, similarity)] for the k most similar rows, best first"""
+        query = normalize_rows(query)[0]
+
+        with self.lock:
+            if self.size == 0:
+                return []
+            if self.storage == 'float32':
+                similarities = self.vectors[:self.size] @ query
+            else:
+                # Dequantize in blocks so scoring never holds a float32 copy of the matrix
+                similarities = np.empty(self.size, dtype=np.float32)
+                for start in range(0, self.size, INDEX_SCAN_BLOCK):
+                    end = min(start + INDEX_SCAN_BLOCK, self.size)
+                    similarities[start:end] = self.vectors[start:end].astype(np.float32) @ query
+                similarities *= self.scales[:self.size]
+            ids = self.ids[:self.size].copy()
+        return top_k(ids, similarities, k, threshold)
+
+class IVFIndex:
+    """Inverted-file (IVF-flat) approximate index over normalized embeddings
+
+    k-means centroids split the vectors into lists and a query is scored only
+    against its `nprobe` nearest lists, so raising nprobe trades latency for
+    recall. New vectors join their nearest list; removed ones are tombstoned
+    until enough accumulate to compact.
+    """
+
+    def __init__(self, centroids, nprobe=IVF_NPROBE):
+        self.lock = threading.Lock()
+        self.centroids = normalize_rows(centroids)
+        self.nprobe = nprobe
+        dim = self.centroids.shape[1]
+        self.vectors = np.empty((0, dim), dtype=np.float32)
+        self.ids = np.empty(0, dtype=np.int64)
+        self.assignments = np.empty(0, dtype=np.int32)
+        self.alive = np.empty(0, dtype=bool)
+        self.size = 0
+        self.tombstones = 0
+        self.rows = {}  # resource_id -> row
+        self.lists = [[] for _ in range(len(self.centroids))]
+        self.list_rows = {}  # list -> cached row array
+
+    @classmethod
+    def build(cls, ids, vectors, n_lists=None, nprobe=IVF_NPROBE, seed=0):
+        """Train centroids on the given vectors and index all of them"""
+        vectors = normalize_rows(vectors)
+        n_lists = n_lists or max(1, int(IVF_LISTS_PER_SQRT * np.sqrt(len(vectors))))
+        index = cls(spherical_kmeans(vectors, n_lists, seed=seed), nprobe)
+        index.add_batch(ids, vectors)
+        return index
+
+    @property
+    def count(self):
+        """Live (not tombstoned) vectors"""
+        return self.size - self.tombstones
+
+    def add(self, resource_id: int, embedding):
+        self.add_batch([resource_id], [embedding])
+
+    def add_batch(self, ids, vectors):
+        vectors = normalize_rows(vectors)
+        assignments = nearest_centroids(vectors, self.centroids)
+
+        with self.lock:
+            # Re-adding an id replaces its vector
+            for resource_id in ids:
+                self.tombstone(resource_id)
+
+            needed = self.size + len(vectors)
+            if needed > len(self.vectors):
+                capacity = max(needed, 2 * len(self.vectors), 64)
+                self.vectors = self.grow(self.vectors, capacity)
+                self.ids = self.grow(self.ids, capacity)
+                self.assignments = self.grow(self.assignments, capacity)
+                self.alive = self.grow(self.alive, capacity)
+
+            rows = range(self.size, needed)
+            self.vectors[self.size:needed] = vectors
+            self.ids[self.size:needed] = ids
+            self.assignments[self.size:needed] = assignments
+            self.alive[self.size:needed] = True
+            for row, resource_id, list_id in zip(rows, ids, assignments):
+                self.rows[int(resource_id)] = row
+                self.lists[list_id].append(row)
+                self.list_rows.pop(list_id, None)
+            self.size = needed
+
+    def grow(self, array, capacity):
+        grown = np.empty((capacity,) + array.shape[1:], dtype=array.dtype)
+        grown[:self.size] = array[:self.size]
+        return grown
+
+    def remove(self, resource_id: int):
+        with self.lock:
+            self.tombstone(resource_id)
+            if self.tombstones > self.size * IVF_COMPACT_FRACTION:
+                self.compact()
+
+    def tombstone(self, resource_id):
+        # Caller holds the lock
+        row = self.rows.pop(int(resource_id), None)
+        if row is not None:
+            self.alive[row] = False
+            self.tombstones += 1
+
+    def compact(self):
+        """Drop tombstoned rows and rebuild the lists; caller holds the lock"""
+        keep = np.flatnonzero(self.alive[:self.size])
+        self.vectors = self.vectors[keep]
+        self.ids = self.ids[keep]
+        self.assignments = self.assignments[keep]
+        self.alive = np.ones(len(keep), dtype=bool)
+        self.size = len(keep)
+        self.tombstones = 0
+        self.rebuild_lists()
+
+    def rebuild_lists(self):
+        self.rows = {int(resource_id): row for row, resource_id in enumerate(self.ids[:self.size])
+                     if self.alive[row]}
+        self.lists = [[] for _ in range(len(self.centroids))]
+        for row, list_id in enumerate(self.assignments[:self.size]):
+            self.lists[list_id].append(row)
+        self.list_rows = {}
+
+    def search(self, query, k: int, threshold: float = None):
+        """Return approximate [(resource_id, similarity)] for the k best matches"""
+        query = normalize_rows(query)[0]
+
+        with self.lock:
+            if self.count == 0:
+                return []
+            probe = min(self.nprobe, len(self.centroids))
+            nearest = np.argpartition(-(self.centroids @ query), probe - 1)[:probe]
+
+            candidates = []
+            for list_id in nearest:
+                rows = self.list_rows.get(list_id)
+                if rows is None:
+                    rows = self.list_rows[list_id] = np.array(self.lists[list_id], dtype=np.int64)
+                candidates.append(rows)
+            rows = np.concatenate(candidates)
+            rows = rows[self.alive[rows]]
+            similarities = self.vectors[rows] @ query
+            ids = self.ids[rows]
+        return top_k(ids, similarities, k, threshold)
+
+    def save(self, path, fingerprint):
+        """Write the index and the catalog fingerprint it matches"""
+        with self.lock, open(path, 'wb') as f:
+            # File object so numpy does not append its own .npz suffix
+            np.savez(
+                f,
+                centroids=self.centroids,
+                vectors=self.vectors[:self.size],
+                ids=self.ids[:self.size],
+                assignments=self.assignments[:self.size],
+                alive=self.alive[:self.size],
+                nprobe=self.nprobe,
+                fingerprint=np.array(fingerprint, dtype=np.int64)
+            )
+
+    @classmethod
+    def load(cls, path):
+        """Return (index, fingerprint) read from save()'s output"""
+        with np.load(path) as data:
+            index = cls(data['centroids'], int(data['nprobe']))
+            index.vectors = np.ascontiguousarray(data['vectors'], dtype=np.float32)
+            index.ids = data['ids'].astype(np.int64)
+            index.assignments = data['assignments'].astype(np.int32)
+            index.alive = data['alive'].astype(bool)
+            fingerprint = tuple(int(value) for value in data['fingerprint'])
+        index.size = len(index.ids)
+        index.tombstones = int(index.size - index.alive.sum())
+        index.rebuild_lists()
+        return index, fingerprint
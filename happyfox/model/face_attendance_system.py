@@ -1,20 +1,521 @@
 import cv2
 import numpy as np
 import sqlite3
-from datetime import datetime
+from datetime import datetime, timedelta
 import os
 from typing import Dict, List
 import gradio as gr
+from recognizers import FACE_SAMPLE_SIZE, HistogramGalleryRecognizer, create_recognizer
+from metrics import Metrics, serve_metrics
 from PIL import Image
 import io
 import base64
+import json
+import time
+import calendar
+import csv
+import zipfile
+import threading
+import queue
+import atexit
+import logging
+import tempfile
+from contextlib import contextmanager
+from urllib.request import pathname2url
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet export is optional
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+DATABASE_PATH = 'attendance.db'
+DATABASE_BUSY_TIMEOUT = 5.0  # seconds to wait on a locked database
+READ_POOL_SIZE = 4  # read-only connections shared by report generation
+
+# Recognizer backend ('lbph' or 'gallery', see recognizers.py)
+RECOGNIZER_BACKEND = 'lbph'
+
+# face_samples fingerprint the persisted recognizer snapshot was trained on
+RECOGNIZER_META_PATH = 'face_recognizer.json'
+
+# Face samples kept per student. A new live capture evicts older live captures,
+# 'oldest' first or the most 'redundant' (closest to a sibling) first, never
+# registration photos; a student whose photos fill the budget keeps no live samples
+MAX_SAMPLES_PER_STUDENT = 10
+SAMPLE_EVICTION = 'redundant'
+
+# Add a sample from live recognitions whose distance is under threshold * margin,
+# at most once per interval per student
+LIVE_ENROLLMENT = False
+LIVE_ENROLLMENT_MARGIN = 0.6
+LIVE_ENROLLMENT_INTERVAL = 300  # seconds
+LIVE_ENROLLMENT_QUEUE_SIZE = 64  # captures waiting to be stored; more are dropped
+
+# Per-section recognizer shards kept in memory (least recently used are dropped).
+# With SHARDED_RECOGNITION the institution-wide recognizer is never loaded and
+# recognition without a section matches only students that have none.
+MAX_LOADED_SHARDS = 8
+SHARDED_RECOGNITION = False
+
+# Evicted samples the recognizer may still hold, as a fraction of its size, before
+# it is rebuilt from face_samples (LBPH cannot forget individual samples)
+STALE_SAMPLE_FRACTION = 0.1
+
+# PRAGMA user_version after face_samples has been backfilled from students.face_image
+SCHEMA_VERSION_FACE_SAMPLES = 1
+
+def normalize_face(face_roi):
+    """Resize a grayscale face crop to the fixed sample size"""
+    return cv2.resize(face_roi, FACE_SAMPLE_SIZE, interpolation=cv2.INTER_AREA)
+
+def decode_face_sample(height, width, face_data):
+    """Rebuild a grayscale crop from its raw uint8 bytes and stored shape"""
+    return np.frombuffer(face_data, np.uint8).reshape(height, width)
+
+_sample_features = None
+
+def eviction_order(samples, policy=SAMPLE_EVICTION):
+    """Order (sample_id, source, face) samples from first to last to evict
+
+    Live captures always go before registration photos. Within each group the
+    policy picks the oldest, or greedily the sample most similar to a remaining
+    sibling in LBP-histogram space.
+    """
+    global _sample_features
+    if policy not in ('oldest', 'redundant'):
+        raise ValueError(f"Unknown eviction policy: {policy}")
+
+    order = []
+    for source in ('live', 'registration'):
+        group = sorted((sample for sample in samples if sample[1] == source),
+                       key=lambda sample: sample[0])
+        if policy == 'oldest' or len(group) < 2:
+            order.extend(sample[0] for sample in group)
+            continue
+
+        if _sample_features is None:
+            _sample_features = HistogramGalleryRecognizer()
+        features = _sample_features.extract_features([sample[2] for sample in group])
+        similarity = features @ features.T
+        np.fill_diagonal(similarity, -np.inf)
+        remaining = list(range(len(group)))
+        while len(remaining) > 1:
+            closest = similarity[np.ix_(remaining, remaining)].max(axis=1)
+            victim = remaining.pop(int(closest.argmax()))
+            order.append(group[victim][0])
+        order.append(group[remaining[0]][0])
+    return order
+
+def load_registration_image(image):
+    """Return (grayscale array, JPEG bytes for storage) for a registration photo
+
+    Accepts a file path, encoded bytes, a PIL image or an RGB/grayscale array.
+    JPEG input is stored as-is; anything else is encoded once.
+    """
+    if isinstance(image, str):
+        with open(image, 'rb') as f:
+            image = f.read()
+
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        data = bytes(image)
+        buffer = np.frombuffer(data, np.uint8)
+        if data[:3] == b'\xff\xd8\xff':
+            # Already JPEG: decode straight to grayscale and keep the original bytes
+            gray = cv2.imdecode(buffer, cv2.IMREAD_GRAYSCALE)
+            if gray is None:
+                raise ValueError("Could not decode the image")
+            return gray, data
+        image = cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError("Could not decode the image")
+        _, img_encoded = cv2.imencode('.jpg', image)
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY), img_encoded.tobytes()
+
+    if isinstance(image, Image.Image):
+        image = image.convert('RGB')
+        encoded = io.BytesIO()
+        image.save(encoded, format='JPEG', quality=95)
+        return cv2.cvtColor(np.asarray(image), cv2.COLOR_RGB2GRAY), encoded.getvalue()
+
+    image = np.asarray(image)
+    if image.ndim == 2:
+        _, img_encoded = cv2.imencode('.jpg', image)
+        return image, img_encoded.tobytes()
+    _, img_encoded = cv2.imencode('.jpg', cv2.cvtColor(image, cv2.COLOR_RGB2BGR))
+    return cv2.cvtColor(image, cv2.COLOR_RGB2GRAY), img_encoded.tobytes()
+
+# Rows per SQLite fetch and per worker task when detecting faces in stored photos
+LOADER_CHUNK_SIZE = 64
+
+# Photos per worker task during bulk enrollment
+BULK_CHUNK_SIZE = 16
+
+# Offline attendance from recorded video or image folders: frames sampled per second
+# of video and frames per worker task
+BATCH_SAMPLE_FPS = 1.0
+BATCH_CHUNK_SIZE = 8
+BATCH_IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+HAAR_CASCADE_PATH = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+
+# Webcam face tracking: association overlap, expiry, and how often tracks are re-recognized
+TRACK_IOU_THRESHOLD = 0.3
+TRACK_MAX_MISSED_FRAMES = 10
+TRACK_RETRY_INTERVAL = 5  # frames between attempts on a face that matched nobody
+TRACK_REVERIFY_INTERVAL = None  # frames between re-checks of a recognized face, None = never
+
+# Webcam detection: 'full' runs the default cascade on every full-resolution frame,
+# 'adaptive' detects on a downscaled frame and skips frames to hold TARGET_FPS
+DETECTION_MODE = 'adaptive'
+DETECTION_SCALE = 0.5
+DETECTION_SCALE_FACTOR = 1.2
+DETECTION_MIN_NEIGHBORS = 5
+DETECTION_MIN_SIZE = (48, 48)  # in full-resolution pixels
+TARGET_FPS = 15
+MAX_DETECTION_INTERVAL = 8
+
+# Webcam stream: recognize on a background thread that only ever takes the newest
+# frame, while the stream callback returns at once with the last known results
+STREAM_BACKGROUND_RECOGNITION = True
+STREAM_FPS_WINDOW = 30  # recent analyzed frames the achieved FPS is measured over
+
+# Write-behind attendance: max events per transaction and max wait to fill a batch
+ATTENDANCE_BATCH_SIZE = 500
+ATTENDANCE_FLUSH_INTERVAL = 0.5  # seconds
+
+# A batch that fails to commit (e.g. the database is locked) is retried with
+# exponential backoff; flush() gives up waiting after ATTENDANCE_FLUSH_TIMEOUT and
+# close() after ATTENDANCE_CLOSE_TIMEOUT
+ATTENDANCE_RETRY_INITIAL = 0.1  # seconds
+ATTENDANCE_RETRY_MAX = 5.0  # seconds
+ATTENDANCE_FLUSH_TIMEOUT = 30.0  # seconds
+ATTENDANCE_CLOSE_TIMEOUT = 10.0  # seconds
+ATTENDANCE_RETRYABLE_ERRORS = (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED, sqlite3.SQLITE_IOERR,
+                               sqlite3.SQLITE_FULL, sqlite3.SQLITE_CANTOPEN)
+
+# Rows per fetch when streaming an attendance export
+EXPORT_CHUNK_SIZE = 5000
+EXPORT_COLUMNS = ['attendance_date', 'student_id', 'name', 'email', 'check_in',
+                  'check_out', 'duration_minutes', 'status']
+
+# Per-stage latency histograms and hit/miss counters (see metrics.py); shown in the
+# Diagnostics tab and, when METRICS_PORT is set, served at http://host:port/metrics
+METRICS_ENABLED = False
+METRICS_PORT = None
+
+_worker_cascade = None
+_worker_recognizer = None
+
+def _init_detection_worker():
+    """Load the cascade once per worker process and keep OpenCV single-threaded"""
+    global _worker_cascade
+    cv2.setNumThreads(1)
+    _worker_cascade = cv2.CascadeClassifier(HAAR_CASCADE_PATH)
+
+def _init_recognition_worker(backend, model_path, threshold):
+    """Load the cascade and a copy of the trained recognizer once per worker process"""
+    global _worker_recognizer
+    _init_detection_worker()
+    _worker_recognizer = create_recognizer(backend)
+    _worker_recognizer.read(model_path)
+    _worker_recognizer.threshold = threshold
+
+def map_chunks_parallel(task, chunks, workers, initializer, initargs=(), inline_kwargs=None):
+    """Yield (chunk, task(chunk)) for an iterator of chunks, in input order
+
+    With more than one worker, at most two chunks per worker are in flight, so
+    only a bounded number of inputs is held in memory. With one worker the task
+    runs inline with inline_kwargs in place of the worker globals.
+    """
+    if workers == 1:
+        for chunk in chunks:
+            yield chunk, task(chunk, **(inline_kwargs or {}))
+        return
+
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer,
+                             initargs=initargs) as pool:
+        for chunk in chunks:
+            pending.append((chunk, pool.submit(task, chunk)))
+            if len(pending) >= workers * 2:
+                chunk, future = pending.popleft()
+                yield chunk, future.result()
+        while pending:
+            chunk, future = pending.popleft()
+            yield chunk, future.result()
+
+def detect_face_chunk(rows, face_cascade=None):
+    """Decode encoded photos and crop the first detected face of each
+
+    Returns the (key, face) pairs found, (key, reason) pairs for photos without
+    a usable face, and the decode and detect times.
+    """
+    if face_cascade is None:
+        face_cascade = _worker_cascade
+    crops = []
+    failures = []
+    decode_time = 0.0
+    detect_time = 0.0
+
+    for key, face_image in rows:
+        if face_image is None:
+            failures.append((key, "No photo"))
+            continue
+
+        start = time.perf_counter()
+        # Convert BYTEA to numpy array
+        nparr = np.frombuffer(face_image, np.uint8)
+        img = cv2.imdecode(nparr, cv2.IMREAD_GRAYSCALE)
+        decoded = time.perf_counter()
+        decode_time += decoded - start
+        if img is None:
+            failures.append((key, "Unreadable image"))
+            continue
+
+        faces = face_cascade.detectMultiScale(img)
+        if len(faces) > 0:
+            (x, y, w, h) = faces[0]
+            crops.append((key, normalize_face(img[y:y+h, x:x+w])))
+        else:
+            failures.append((key, "No face detected in the image"))
+        detect_time += time.perf_counter() - decoded
+
+    return crops, failures, decode_time, detect_time
+
+def detect_faces_parallel(chunks, face_cascade, workers=None, timings=None):
+    """Run detect_face_chunk over an iterator of (key, photo bytes) chunks
+
+    Yields (rows, crops, failures) per chunk in input order. At most two chunks per
+    worker are in flight, so only a bounded number of photos is held in memory.
+    Decode and detect times are summed across workers into `timings`.
+    """
+    workers = workers or os.cpu_count() or 1
+    if timings is None:
+        timings = {}
+    timings.setdefault('decode', 0.0)
+    timings.setdefault('detect', 0.0)
+
+    def collect(rows, result):
+        crops, failures, decode_time, detect_time = result
+        timings['decode'] += decode_time
+        timings['detect'] += detect_time
+        return rows, crops, failures
+
+    for rows, result in map_chunks_parallel(
+            detect_face_chunk, chunks, workers, _init_detection_worker,
+            inline_kwargs={'face_cascade': face_cascade}):
+        yield collect(rows, result)
+
+def recognize_frame_chunk(frames, face_cascade=None, recognizer=None):
+    """Detect and identify every face in a chunk of (timestamp, frame) pairs
+
+    Frames are grayscale arrays or encoded image bytes. Returns per frame the
+    number of faces found and the recognized student ids.
+    """
+    if face_cascade is None:
+        face_cascade = _worker_cascade
+    if recognizer is None:
+        recognizer = _worker_recognizer
+
+    results = []
+    for _, frame in frames:
+        if isinstance(frame, bytes):
+            frame = cv2.imdecode(np.frombuffer(frame, np.uint8), cv2.IMREAD_GRAYSCALE)
+            if frame is None:
+                results.append((0, []))
+                continue
+
+        faces = face_cascade.detectMultiScale(frame)
+        face_rois = [normalize_face(frame[y:y+h, x:x+w]) for (x, y, w, h) in faces]
+        labels = recognizer.identify(face_rois) if face_rois else []
+        results.append((len(faces), [label for label in labels if label is not None]))
+    return results
+
+def load_training_faces(cursor, face_cascade, workers=None, chunk_size=LOADER_CHUNK_SIZE):
+    """Stream (student_id, face_image) rows from an executed cursor and detect faces in parallel
+
+    Rows are fetched chunk by chunk, which bounds peak memory. Crops come back in
+    the cursor's row order.
+    """
+    face_images = []
+    labels = []
+    timings = {'fetch': 0.0, 'decode': 0.0, 'detect': 0.0, 'total': 0.0}
+    started = time.perf_counter()
+
+    def fetch_chunks():
+        while True:
+            start = time.perf_counter()
+            rows = cursor.fetchmany(chunk_size)
+            timings['fetch'] += time.perf_counter() - start
+            if not rows:
+                return
+            yield rows
+
+    for _, crops, _ in detect_faces_parallel(fetch_chunks(), face_cascade, workers, timings):
+        for student_id, face_roi in crops:
+            labels.append(student_id)
+            face_images.append(face_roi)
+
+    # decode/detect are summed across workers, fetch and total are wall-clock
+    timings['total'] = time.perf_counter() - started
+    return face_images, labels, timings
+
+@contextmanager
+def open_photo_source(path):
+    """Yield a function that reads a named photo from a folder or a zip archive"""
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            yield archive.read
+    elif os.path.isdir(path):
+        root = os.path.realpath(path)
+
+        def read_photo(name):
+            photo_path = os.path.realpath(os.path.join(root, name))
+            # Roster entries must not point outside the photo folder
+            if os.path.commonpath([root, photo_path]) != root:
+                raise KeyError(name)
+            with open(photo_path, 'rb') as f:
+                return f.read()
+
+        yield read_photo
+    else:
+        raise ValueError(f"Photo source must be a folder or a zip archive: {path}")
+
+def read_video_frames(video_path, sample_fps=BATCH_SAMPLE_FPS, start_time=None):
+    """Yield (timestamp, grayscale frame) for frames sampled from a video file
+
+    Skipped frames are grabbed without decoding. Timestamps count from start_time,
+    which defaults to the file's modification time minus the video's duration.
+    """
+    capture = cv2.VideoCapture(video_path)
+    if not capture.isOpened():
+        raise ValueError(f"Could not open video: {video_path}")
+
+    try:
+        fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+        if start_time is None:
+            duration = max(capture.get(cv2.CAP_PROP_FRAME_COUNT), 0) / fps
+            start_time = (datetime.fromtimestamp(os.path.getmtime(video_path)) -
+                          timedelta(seconds=duration))
+        step = max(1, round(fps / sample_fps))
+
+        frame_index = 0
+        while True:
+            if frame_index % step:
+                if not capture.grab():
+                    return
+            else:
+                ok, frame = capture.read()
+                if not ok:
+                    return
+                timestamp = start_time + timedelta(seconds=frame_index / fps)
+                yield timestamp, cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            frame_index += 1
+    finally:
+        capture.release()
+
+def read_image_folder(folder):
+    """Yield (modification time, encoded bytes) for each image in a folder, oldest first"""
+    paths = [
+        os.path.join(folder, name) for name in os.listdir(folder)
+        if name.lower().endswith(BATCH_IMAGE_EXTENSIONS)
+    ]
+    paths.sort(key=lambda path: (os.path.getmtime(path), path))
+    for path in paths:
+        with open(path, 'rb') as f:
+            yield datetime.fromtimestamp(os.path.getmtime(path)), f.read()
+
+def read_roster(roster_path):
+    """Read a CSV roster with name, email and photo columns (and optionally section)"""
+    with open(roster_path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f)
+        missing = {'name', 'email', 'photo'} - set(reader.fieldnames or [])
+        if missing:
+            raise ValueError(f"Roster is missing columns: {', '.join(sorted(missing))}")
+        return list(reader)
+
+def format_enrollment_report(results):
+    """Plain-text summary of bulk_register_students results"""
+    enrolled = sum(1 for r in results if r['status'] == 'enrolled')
+    report = f"Enrolled {enrolled} of {len(results)} students\n"
+    report += "-" * 50 + "\n"
+    for r in results:
+        report += f"{r['photo']} | {r['name']} | {r['status']} | {r['detail']}\n"
+    return report
+
+def connect_database(db_path=DATABASE_PATH, read_only=False):
+    """Open a SQLite connection with WAL journaling and a busy timeout"""
+    if read_only:
+        # Pooled connections are handed between threads, one borrower at a time
+        uri = f"file:{pathname2url(os.path.abspath(db_path))}?mode=ro"
+        return sqlite3.connect(uri, uri=True, timeout=DATABASE_BUSY_TIMEOUT,
+                               check_same_thread=False)
+
+    conn = sqlite3.connect(db_path, timeout=DATABASE_BUSY_TIMEOUT)
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
 
 class DatabaseHandler:
-    def __init__(self):
-        self.conn = sqlite3.connect('attendance.db', check_same_thread=False)
-        self.cursor = self.conn.cursor()
+    """Gives every thread its own connection and reports a pool of read-only ones"""
+
+    def __init__(self, db_path=DATABASE_PATH, read_pool_size=READ_POOL_SIZE):
+        self.db_path = db_path
+        self.local = threading.local()
+        self.read_pool = queue.Queue()
+        self.read_pool_size = read_pool_size
+        self.read_connections = 0
+        self.pool_lock = threading.Lock()
         self.create_tables()
 
+    def ensure_connection(self):
+        """Open the calling thread's read-write connection and cursor unless it has them"""
+        if getattr(self.local, 'conn', None) is None:
+            conn = connect_database(self.db_path)
+            self.local.conn = conn
+            self.local.cursor = conn.cursor()
+
+    @property
+    def conn(self):
+        """The calling thread's read-write connection, opened on first use"""
+        self.ensure_connection()
+        return self.local.conn
+
+    @property
+    def cursor(self):
+        """The calling thread's cursor on its own connection"""
+        self.ensure_connection()
+        return self.local.cursor
+
+    @contextmanager
+    def read_connection(self):
+        """Borrow a read-only connection from the pool, blocking if all are in use"""
+        try:
+            conn = self.read_pool.get_nowait()
+        except queue.Empty:
+            with self.pool_lock:
+                can_open = self.read_connections < self.read_pool_size
+                if can_open:
+                    self.read_connections += 1
+            if not can_open:
+                conn = self.read_pool.get()
+            else:
+                try:
+                    conn = connect_database(self.db_path, read_only=True)
+                except Exception:
+                    # Give the slot back, or readers would wait on a connection that never exists
+                    with self.pool_lock:
+                        self.read_connections -= 1
+                    raise
+        try:
+            yield conn
+        finally:
+            self.read_pool.put(conn)
+
     def create_tables(self):
         self.cursor.execute("""
             CREATE TABLE IF NOT EXISTS students (
@@ -36,183 +537,1731 @@ class DatabaseHandler:
                 FOREIGN KEY (student_id) REFERENCES students(student_id)
             )
         """)
+
+        # Normalized grayscale face crops used to train the recognizer
+        self.cursor.execute("""
+            CREATE TABLE IF NOT EXISTS face_samples (
+                sample_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                student_id INTEGER,
+                height INTEGER,
+                width INTEGER,
+                face_data BLOB,
+                created_at DATETIME DEFAULT (datetime('now', 'localtime')),
+                FOREIGN KEY (student_id) REFERENCES students(student_id)
+            )
+        """)
+
+        self.cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_face_samples_student
+            ON face_samples (student_id)
+        """)
+
+        # Class section each student is recognized in (NULL = none)
+        self.cursor.execute("PRAGMA table_info(students)")
+        if 'section' not in [column[1] for column in self.cursor.fetchall()]:
+            self.cursor.execute("ALTER TABLE students ADD COLUMN section TEXT")
+        self.cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_students_section
+            ON students (section)
+        """)
+
+        # 'registration' photos or 'live' captures, which are evicted first
+        self.cursor.execute("PRAGMA table_info(face_samples)")
+        if 'source' not in [column[1] for column in self.cursor.fetchall()]:
+            self.cursor.execute("""
+                ALTER TABLE face_samples
+                ADD COLUMN source TEXT NOT NULL DEFAULT 'registration'
+            """)
+
+        self.migrate_attendance_indexes()
+        self.migrate_attendance_summary()
         
         self.conn.commit()
 
+    def migrate_attendance_indexes(self):
+        """Give attendance one row per student per day, enforced by a unique index"""
+        self.cursor.execute("""
+            SELECT 1 FROM sqlite_master
+            WHERE type = 'index' AND name = 'idx_attendance_student_date'
+        """)
+        if self.cursor.fetchone() is None:
+            # Store plain YYYY-MM-DD so equality and range predicates can use the index
+            self.cursor.execute("""
+                UPDATE attendance SET attendance_date = date(attendance_date)
+                WHERE attendance_date IS NOT date(attendance_date)
+            """)
+
+            # Keep the earliest record when a student has several for one day
+            self.cursor.execute("""
+                DELETE FROM attendance
+                WHERE attendance_date IS NOT NULL
+                AND attendance_id NOT IN (
+                    SELECT MIN(attendance_id) FROM attendance
+                    WHERE attendance_date IS NOT NULL
+                    GROUP BY student_id, attendance_date
+                )
+            """)
+
+            self.cursor.execute("""
+                CREATE UNIQUE INDEX idx_attendance_student_date
+                ON attendance (student_id, attendance_date)
+            """)
+
+        # Reports filter by date alone, which the composite index cannot serve
+        self.cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_attendance_date
+            ON attendance (attendance_date)
+        """)
+
+    def migrate_attendance_summary(self):
+        """Per-day attendance counts, kept current by triggers on attendance"""
+        self.cursor.execute("""
+            SELECT 1 FROM sqlite_master
+            WHERE type = 'table' AND name = 'attendance_daily_summary'
+        """)
+        needs_backfill = self.cursor.fetchone() is None
+
+        self.cursor.execute("""
+            CREATE TABLE IF NOT EXISTS attendance_daily_summary (
+                attendance_date DATE PRIMARY KEY,
+                total INTEGER NOT NULL DEFAULT 0,
+                on_time INTEGER NOT NULL DEFAULT 0,
+                late INTEGER NOT NULL DEFAULT 0,
+                very_late INTEGER NOT NULL DEFAULT 0,
+                still_present INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+
+        # Same status rules as the detailed report: on_time, late, very_late, still_present
+        def counts(row):
+            return [
+                f"CASE WHEN time({row}.check_in) <= time('09:00:00') THEN 1 ELSE 0 END",
+                f"CASE WHEN time({row}.check_in) <= time('09:00:00') THEN 0 "
+                f"WHEN time({row}.check_in) <= time('09:30:00') THEN 1 ELSE 0 END",
+                f"CASE WHEN time({row}.check_in) <= time('09:30:00') THEN 0 ELSE 1 END",
+                f"CASE WHEN {row}.check_out IS NULL THEN 1 ELSE 0 END"
+            ]
+        columns = ['on_time', 'late', 'very_late', 'still_present']
+
+        add_new = f"""
+            INSERT INTO attendance_daily_summary
+                (attendance_date, total, {', '.join(columns)})
+            SELECT NEW.attendance_date, 1, {', '.join(counts('NEW'))}
+            WHERE NEW.attendance_date IS NOT NULL
+            ON CONFLICT (attendance_date) DO UPDATE SET
+                total = total + 1,
+                {', '.join(f"{c} = {c} + excluded.{c}" for c in columns)};
+        """
+        remove_old = f"""
+            UPDATE attendance_daily_summary SET
+                total = total - 1,
+                {', '.join(f"{c} = {c} - ({e})" for c, e in zip(columns, counts('OLD')))}
+            WHERE attendance_date = OLD.attendance_date;
+        """
+
+        self.cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_attendance_summary_insert
+            AFTER INSERT ON attendance
+            BEGIN {add_new} END
+        """)
+        self.cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_attendance_summary_update
+            AFTER UPDATE OF check_in, check_out, attendance_date ON attendance
+            BEGIN {remove_old} {add_new} END
+        """)
+        self.cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_attendance_summary_delete
+            AFTER DELETE ON attendance
+            BEGIN {remove_old} END
+        """)
+
+        if needs_backfill:
+            self.cursor.execute(f"""
+                INSERT INTO attendance_daily_summary
+                    (attendance_date, total, {', '.join(columns)})
+                SELECT a.attendance_date, COUNT(*),
+                    {', '.join(f"SUM({e})" for e in counts('a'))}
+                FROM attendance a
+                WHERE a.attendance_date IS NOT NULL
+                GROUP BY a.attendance_date
+            """)
+
+    def get_schema_version(self):
+        self.cursor.execute("PRAGMA user_version")
+        return self.cursor.fetchone()[0]
+
+    def set_schema_version(self, version: int):
+        # PRAGMA does not accept bound parameters
+        self.cursor.execute(f"PRAGMA user_version = {int(version)}")
+
+    def add_face_sample(self, student_id: int, face, source='registration'):
+        """Insert a normalized face crop and return its sample_id; the caller commits"""
+        height, width = face.shape
+        self.cursor.execute("""
+            INSERT INTO face_samples (student_id, height, width, face_data, source)
+            VALUES (?, ?, ?, ?, ?)
+        """, (student_id, height, width, face.tobytes(), source))
+        return self.cursor.lastrowid
+
+    def fetch_face_samples(self, after_sample_id=None):
+        """Return (faces, labels, max sample_id) for all samples, optionally only those after a sample id"""
+        if after_sample_id is None:
+            self.cursor.execute("""
+                SELECT sample_id, student_id, height, width, face_data
+                FROM face_samples ORDER BY student_id, sample_id
+            """)
+        else:
+            self.cursor.execute("""
+                SELECT sample_id, student_id, height, width, face_data
+                FROM face_samples WHERE sample_id > ?
+                ORDER BY sample_id
+            """, (after_sample_id,))
+
+        faces = []
+        labels = []
+        max_sample_id = after_sample_id
+        for sample_id, student_id, height, width, face_data in self.cursor:
+            faces.append(decode_face_sample(height, width, face_data))
+            labels.append(student_id)
+            max_sample_id = sample_id if max_sample_id is None else max(max_sample_id, sample_id)
+        return faces, labels, max_sample_id
+
+    def fetch_student_directory(self, student_id=None):
+        """Return {student_id: {'name', 'email', 'section'}} for all students or a single one"""
+        if student_id is None:
+            self.cursor.execute("SELECT student_id, name, email, section FROM students")
+        else:
+            self.cursor.execute(
+                "SELECT student_id, name, email, section FROM students WHERE student_id = ?",
+                (student_id,)
+            )
+        return {
+            row_id: {'name': name, 'email': email, 'section': section}
+            for row_id, name, email, section in self.cursor.fetchall()
+        }
+
+    def fetch_section_samples(self, section):
+        """Return (faces, labels) for the students of one section (None = no section)"""
+        self.cursor.execute("""
+            SELECT f.student_id, f.height, f.width, f.face_data
+            FROM students s
+            JOIN face_samples f ON f.student_id = s.student_id
+            WHERE s.section IS ?
+            ORDER BY f.student_id, f.sample_id
+        """, (section,))
+
+        faces = []
+        labels = []
+        for student_id, height, width, face_data in self.cursor:
+            faces.append(decode_face_sample(height, width, face_data))
+            labels.append(student_id)
+        return faces, labels
+
+    def fetch_student_samples(self, student_id: int):
+        """Return (sample_id, source, face) for every sample of one student"""
+        self.cursor.execute("""
+            SELECT sample_id, source, height, width, face_data
+            FROM face_samples WHERE student_id = ? ORDER BY sample_id
+        """, (student_id,))
+        return [
+            (sample_id, source, decode_face_sample(height, width, face_data))
+            for sample_id, source, height, width, face_data in self.cursor.fetchall()
+        ]
+
+    def delete_face_samples(self, sample_ids):
+        """Delete samples by id; the caller commits"""
+        self.cursor.executemany(
+            "DELETE FROM face_samples WHERE sample_id = ?",
+            [(sample_id,) for sample_id in sample_ids]
+        )
+
+    def get_samples_fingerprint(self, upto_sample_id=None):
+        """Return (max sample_id, row count), optionally limited to ids <= upto_sample_id"""
+        if upto_sample_id is None:
+            self.cursor.execute("SELECT MAX(sample_id), COUNT(*) FROM face_samples")
+        else:
+            self.cursor.execute(
+                "SELECT MAX(sample_id), COUNT(*) FROM face_samples WHERE sample_id <= ?",
+                (upto_sample_id,)
+            )
+        max_id, row_count = self.cursor.fetchone()
+        return max_id, row_count
+
+def normalize_section(section):
+    """Strip a section name; blank means no section"""
+    if section is None:
+        return None
+    section = str(section).strip()
+    return section or None
+
+class RecognizerShards:
+    """Per-section recognizers trained on demand from face_samples, kept in an LRU
+
+    A cold section is read and trained outside the lock, so it never blocks
+    recognition in other sections; concurrent callers for the same section
+    wait on one shared load instead of training it twice.
+    """
+
+    def __init__(self, db, backend, capacity=MAX_LOADED_SHARDS):
+        self.db = db
+        self.backend = backend
+        self.capacity = capacity
+        self.shards = OrderedDict()  # section -> recognizer, or None for an empty section
+        self.loading = {}  # section -> Future of the shard being trained
+        self.invalidated = set()  # loading sections changed since their samples were read
+        self.lock = threading.Lock()
+
+    def get(self, section):
+        """Recognizer for a section, training it if it is not loaded; None if it has no faces"""
+        with self.lock:
+            if section in self.shards:
+                self.shards.move_to_end(section)
+                return self.shards[section]
+            future = self.loading.get(section)
+            if future is not None:
+                loader = False
+            else:
+                loader = True
+                future = self.loading[section] = Future()
+        if not loader:
+            return future.result()
+
+        try:
+            recognizer = None
+            faces, labels = self.db.fetch_section_samples(section)
+            if faces:
+                recognizer = create_recognizer(self.backend)
+                recognizer.train(faces, labels)
+        except Exception as e:
+            with self.lock:
+                del self.loading[section]
+                self.invalidated.discard(section)
+            future.set_exception(e)
+            raise
+
+        with self.lock:
+            del self.loading[section]
+            # A shard that missed an add() or discard() serves this call but is not cached
+            if section in self.invalidated:
+                self.invalidated.discard(section)
+            else:
+                self.shards[section] = recognizer
+                while len(self.shards) > self.capacity:
+                    self.shards.popitem(last=False)
+        future.set_result(recognizer)
+        return recognizer
+
+    def add(self, faces, labels, sections):
+        """Add new samples to the shards of their sections that are loaded"""
+        by_section = {}
+        for face, label, section in zip(faces, labels, sections):
+            section_faces, section_labels = by_section.setdefault(section, ([], []))
+            section_faces.append(face)
+            section_labels.append(label)
+
+        with self.lock:
+            targets = []
+            for section in by_section:
+                if section in self.loading:
+                    self.invalidated.add(section)
+                if section in self.shards:
+                    targets.append((section, self.shards[section]))
+
+        # Recognizers lock themselves, so only this section's shard waits on the update
+        for section, recognizer in targets:
+            section_faces, section_labels = by_section[section]
+            if recognizer is not None:
+                recognizer.update(section_faces, section_labels)
+                continue
+            # First faces of an empty section: install the new shard unless it changed meanwhile
+            recognizer = create_recognizer(self.backend)
+            recognizer.train(section_faces, section_labels)
+            with self.lock:
+                if section in self.shards and self.shards[section] is None:
+                    self.shards[section] = recognizer
+                else:
+                    self.shards.pop(section, None)
+
+    def discard(self, section):
+        """Drop a section's shard so it is retrained on next use"""
+        with self.lock:
+            self.shards.pop(section, None)
+            if section in self.loading:
+                self.invalidated.add(section)
+
+def box_iou(box_a, box_b):
+    """Intersection over union of two (x, y, w, h) boxes"""
+    ax, ay, aw, ah = box_a
+    bx, by, bw, bh = box_b
+    inter_w = min(ax + aw, bx + bw) - max(ax, bx)
+    inter_h = min(ay + ah, by + bh) - max(ay, by)
+    if inter_w <= 0 or inter_h <= 0:
+        return 0.0
+    inter = inter_w * inter_h
+    return inter / float(aw * ah + bw * bh - inter)
+
+class AttendanceWriter:
+    """Single writer thread that applies queued attendance events in batched transactions
+
+    A batch that fails to commit is retried with backoff until it succeeds, so
+    events are never dropped while the database is temporarily locked. The
+    failure is logged, counted and kept in last_error, and flush() raises
+    instead of blocking forever when the writer cannot catch up.
+    """
+
+    def __init__(self, db_path=DATABASE_PATH, batch_size=ATTENDANCE_BATCH_SIZE,
+                 flush_interval=ATTENDANCE_FLUSH_INTERVAL, metrics=None):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.metrics = metrics or Metrics()
+        self.events = queue.Queue()
+        self.last_error = None
+        self.closing = False
+        self.thread = threading.Thread(target=self.run, name='attendance-writer', daemon=True)
+        self.thread.start()
+
+    def submit(self, student_id: int, timestamp: datetime, offline=False):
+        """Queue a live check-in/check-out event, or an offline sighting from a recording"""
+        self.events.put((student_id, timestamp, offline))
+
+    def flush(self, timeout=ATTENDANCE_FLUSH_TIMEOUT):
+        """Block until every event submitted so far has been committed
+
+        Raises RuntimeError if the writer thread has stopped and TimeoutError if
+        events are still uncommitted after `timeout` seconds (None waits forever).
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.events.all_tasks_done:
+            while self.events.unfinished_tasks:
+                if not self.thread.is_alive():
+                    raise RuntimeError(f"Attendance writer has stopped: {self.last_error}")
+                wait = 0.5
+                if deadline is not None:
+                    wait = min(wait, deadline - time.monotonic())
+                    if wait <= 0:
+                        raise TimeoutError(
+                            f"{self.events.unfinished_tasks} attendance events not yet "
+                            f"committed: {self.last_error}"
+                        )
+                self.events.all_tasks_done.wait(wait)
+
+    def close(self, timeout=ATTENDANCE_CLOSE_TIMEOUT):
+        """Flush outstanding events and stop the writer thread"""
+        if self.thread.is_alive():
+            self.closing = True
+            self.events.put(None)
+            self.thread.join(timeout)
+            if self.thread.is_alive():
+                logger.error("Attendance writer did not finish; %d events were not committed: %s",
+                             self.events.unfinished_tasks - 1, self.last_error)
+
+    def run(self):
+        conn = None
+        stopping = False
+        while not stopping:
+            batch = [self.events.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size and batch[-1] is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.events.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            stopping = batch[-1] is None
+            conn = self.commit_with_retry(conn, [event for event in batch if event is not None])
+            for _ in batch:
+                self.events.task_done()
+
+        if conn is not None:
+            conn.close()
+
+    def commit_with_retry(self, conn, events):
+        """Apply a batch, reconnecting and retrying with backoff until it commits
+
+        Returns the connection to keep using. Transient errors (locked or busy
+        database, I/O, disk full) are retried; errors a retry cannot fix drop
+        the batch.
+        """
+        delay = ATTENDANCE_RETRY_INITIAL
+        while True:
+            try:
+                if conn is None:
+                    conn = connect_database(self.db_path)
+                    conn.execute("PRAGMA synchronous=NORMAL")
+                self.apply_batch(conn, events)
+                self.last_error = None
+                return conn
+            except sqlite3.Error as e:
+                self.last_error = e
+                # Extended result codes keep the primary code in the low byte
+                if (getattr(e, 'sqlite_errorcode', None) or 0) & 0xff not in ATTENDANCE_RETRYABLE_ERRORS:
+                    self.metrics.increment('attendance_events_dropped', len(events))
+                    logger.error("Dropping attendance batch of %d events: %s", len(events), e)
+                    return conn
+                self.metrics.increment('attendance_write_retries')
+                logger.warning("Attendance batch of %d events failed, retrying in %.1fs: %s",
+                               len(events), delay, e)
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except sqlite3.Error:
+                        pass
+                    conn = None
+            except Exception as e:
+                self.last_error = e
+                self.metrics.increment('attendance_events_dropped', len(events))
+                logger.exception("Dropping attendance batch of %d events", len(events))
+                return conn
+            time.sleep(delay)
+            delay = min(delay * 2, ATTENDANCE_RETRY_MAX)
+
+    def apply_batch(self, conn, events):
+        # Only the first two live events per student per day matter (check-in, then
+        # check-out) and only the earliest offline one, so the rest are dropped
+        # before touching the DB
+        collapsed = {}
+        for student_id, timestamp, offline in events:
+            times = collapsed.setdefault((student_id, timestamp.strftime('%Y-%m-%d'), offline), [])
+            current_time = timestamp.strftime('%Y-%m-%d %H:%M:%S')
+            if offline:
+                times[:] = [min(times + [current_time])]
+            elif len(times) < 2:
+                times.append(current_time)
+
+        with self.metrics.stage('db_commit'), conn:
+            for (student_id, day, offline), times in collapsed.items():
+                for current_time in times:
+                    if offline:
+                        self.apply_offline_event(conn, student_id, day, current_time)
+                    else:
+                        self.apply_event(conn, student_id, day, current_time)
+        self.metrics.increment('events_committed', len(events))
+
+    def apply_offline_event(self, conn, student_id, day, seen_time):
+        # A recording processed after the fact can only move check-in earlier; it
+        # never sets check_out, so re-runs and late processing cannot invert a visit
+        conn.execute("""
+            INSERT INTO attendance (student_id, check_in, attendance_date)
+            VALUES (?, ?, ?)
+            ON CONFLICT (student_id, attendance_date) DO UPDATE
+            SET check_in = excluded.check_in
+            WHERE excluded.check_in < attendance.check_in
+        """, (student_id, seen_time, day))
+
+    def apply_event(self, conn, student_id, day, current_time):
+        # Check in on the first event of the day, check out on the second, then no-op
+        conn.execute("""
+            INSERT INTO attendance (student_id, check_in, attendance_date)
+            VALUES (?, ?, ?)
+            ON CONFLICT (student_id, attendance_date) DO UPDATE
+            SET check_out = excluded.check_in
+            WHERE attendance.check_out IS NULL
+        """, (student_id, current_time, day))
+
+class FaceTrack:
+    def __init__(self, track_id: int, box, frame_index: int):
+        self.track_id = track_id
+        self.box = box
+        self.last_seen = frame_index
+        self.last_recognized = None
+        self.student_id = None
+        self.student_name = None
+        self.attendance_marked = False
+
+class FaceTracker:
+    """Associates detections across frames so each face is recognized once per track"""
+
+    def __init__(self, iou_threshold=TRACK_IOU_THRESHOLD,
+                 max_missed_frames=TRACK_MAX_MISSED_FRAMES,
+                 retry_interval=TRACK_RETRY_INTERVAL,
+                 reverify_interval=TRACK_REVERIFY_INTERVAL):
+        self.iou_threshold = iou_threshold
+        self.max_missed_frames = max_missed_frames
+        self.retry_interval = retry_interval
+        self.reverify_interval = reverify_interval
+        self.tracks: Dict[int, FaceTrack] = {}
+        self.next_track_id = 1
+
+    def update(self, boxes, frame_index: int) -> List[FaceTrack]:
+        """Match this frame's boxes to live tracks and return the tracks seen in it"""
+        boxes = [tuple(int(v) for v in box) for box in boxes]
+
+        # Greedy association: best IoU first, then nearest centroid for fast movers
+        candidates = []
+        for track_id, track in self.tracks.items():
+            tx, ty, tw, th = track.box
+            for index, box in enumerate(boxes):
+                iou = box_iou(track.box, box)
+                if iou >= self.iou_threshold:
+                    candidates.append((1.0 + iou, track_id, index))
+                    continue
+                x, y, w, h = box
+                distance = np.hypot((x + w / 2) - (tx + tw / 2), (y + h / 2) - (ty + th / 2))
+                if distance < 0.5 * max(tw, w):
+                    candidates.append((1.0 - distance / max(tw, w), track_id, index))
+        candidates.sort(reverse=True)
+
+        matched_tracks = set()
+        matched_boxes = set()
+        visible = []
+        for _, track_id, index in candidates:
+            if track_id in matched_tracks or index in matched_boxes:
+                continue
+            track = self.tracks[track_id]
+            track.box = boxes[index]
+            track.last_seen = frame_index
+            matched_tracks.add(track_id)
+            matched_boxes.add(index)
+            visible.append(track)
+
+        for index, box in enumerate(boxes):
+            if index not in matched_boxes:
+                track = FaceTrack(self.next_track_id, box, frame_index)
+                self.tracks[track.track_id] = track
+                self.next_track_id += 1
+                visible.append(track)
+
+        # Expire tracks that have been out of view too long
+        self.tracks = {
+            track_id: track for track_id, track in self.tracks.items()
+            if frame_index - track.last_seen <= self.max_missed_frames
+        }
+        return visible
+
+    def needs_recognition(self, track: FaceTrack, frame_index: int) -> bool:
+        if track.last_recognized is None:
+            return True
+        if track.student_id is None:
+            interval = self.retry_interval
+        else:
+            interval = self.reverify_interval
+        return interval is not None and frame_index - track.last_recognized >= interval
+
+class DetectionScheduler:
+    """Decides which webcam frames run the cascade and how, based on measured latency"""
+
+    def __init__(self, face_cascade, mode=DETECTION_MODE, scale=DETECTION_SCALE,
+                 scale_factor=DETECTION_SCALE_FACTOR, min_neighbors=DETECTION_MIN_NEIGHBORS,
+                 min_size=DETECTION_MIN_SIZE, target_fps=TARGET_FPS,
+                 max_interval=MAX_DETECTION_INTERVAL):
+        if mode not in ('full', 'adaptive'):
+            raise ValueError(f"Unknown detection mode: {mode}")
+        self.face_cascade = face_cascade
+        self.mode = mode
+        self.scale = scale
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size
+        self.frame_budget = 1.0 / target_fps
+        self.max_interval = max_interval
+        self.interval = 1
+        self.frames_since_detection = None
+        self.avg_latency = None
+
+    def should_detect(self) -> bool:
+        """Call once per frame; True when this frame should run full detection"""
+        if (self.mode == 'full' or self.frames_since_detection is None or
+                self.frames_since_detection + 1 >= self.interval):
+            self.frames_since_detection = 0
+            return True
+        self.frames_since_detection += 1
+        return False
+
+    def detect(self, gray):
+        """Run the cascade, on a downscaled copy in adaptive mode, and return full-res boxes"""
+        if self.mode == 'full':
+            return self.face_cascade.detectMultiScale(gray)
+
+        small = cv2.resize(gray, None, fx=self.scale, fy=self.scale,
+                           interpolation=cv2.INTER_AREA)
+        min_size = (int(self.min_size[0] * self.scale), int(self.min_size[1] * self.scale))
+        faces = self.face_cascade.detectMultiScale(
+            small,
+            scaleFactor=self.scale_factor,
+            minNeighbors=self.min_neighbors,
+            minSize=min_size
+        )
+        if len(faces) == 0:
+            return []
+        return [tuple(int(round(v / self.scale)) for v in face) for face in faces]
+
+    def record_latency(self, seconds: float, detected: bool):
+        """Track per-frame latency and retune the skip interval once per detection cycle"""
+        if self.avg_latency is None:
+            self.avg_latency = seconds
+        else:
+            self.avg_latency = 0.8 * self.avg_latency + 0.2 * seconds
+
+        if self.mode == 'full' or not detected:
+            return
+        if self.avg_latency > self.frame_budget and self.interval < self.max_interval:
+            self.interval += 1
+        elif self.avg_latency < 0.5 * self.frame_budget and self.interval > 1:
+            self.interval -= 1
+
+class LatestFrameWorker:
+    """Background thread that analyzes only the newest submitted frame
+
+    submit() overwrites a single-slot buffer, so frames that arrive while the
+    worker is busy are dropped instead of queued and results never fall behind.
+    """
+
+    def __init__(self, analyze, metrics=None, fps_window=STREAM_FPS_WINDOW):
+        self.analyze = analyze
+        self.metrics = metrics or Metrics()
+        self.condition = threading.Condition()
+        self.pending = None
+        self.submitted = 0
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.completed = deque(maxlen=fps_window)
+        self.last_error = None
+        self.thread = threading.Thread(target=self.run, name='stream-recognition', daemon=True)
+        self.thread.start()
+
+    def submit(self, frame, section=None):
+        with self.condition:
+            if self.pending is not None:
+                # The worker never saw the previous frame
+                self.dropped += 1
+                self.metrics.increment('stream_frames_dropped')
+            self.pending = (frame, section)
+            self.submitted += 1
+            self.condition.notify()
+        self.metrics.increment('stream_frames_submitted')
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.pending is None:
+                    self.condition.wait()
+                frame, section = self.pending
+                self.pending = None
+
+            started = time.perf_counter()
+            try:
+                self.analyze(frame, section)
+                self.last_error = None
+            except Exception as e:
+                # Keep serving the last good overlay, but make the failure visible
+                self.last_error = e
+                with self.condition:
+                    self.errors += 1
+                self.metrics.increment('stream_errors')
+                logger.exception("Stream frame analysis failed")
+            self.metrics.observe('stream_analyze', time.perf_counter() - started)
+
+            with self.condition:
+                self.processed += 1
+                self.completed.append(time.monotonic())
+            stats = self.stats()
+            self.metrics.set_gauge('stream_fps', stats['fps'])
+            self.metrics.set_gauge('stream_drop_rate', stats['drop_rate'])
+
+    def stats(self):
+        """Frames submitted, processed, dropped and failed, the drop rate, the achieved FPS and the last error"""
+        with self.condition:
+            fps = 0.0
+            if len(self.completed) > 1:
+                span = self.completed[-1] - self.completed[0]
+                if span > 0:
+                    fps = (len(self.completed) - 1) / span
+            return {
+                'submitted': self.submitted,
+                'processed': self.processed,
+                'dropped': self.dropped,
+                'drop_rate': self.dropped / self.submitted if self.submitted else 0.0,
+                'fps': fps,
+                'errors': self.errors,
+                'last_error': self.last_error
+            }
+
 class SimpleFaceRecognitionSystem:
-    def __init__(self):
+    def __init__(self, detection_mode=DETECTION_MODE, recognizer_backend=RECOGNIZER_BACKEND,
+                 metrics_enabled=METRICS_ENABLED, max_samples=MAX_SAMPLES_PER_STUDENT,
+                 live_enrollment=LIVE_ENROLLMENT, sharded=SHARDED_RECOGNITION):
+        self.metrics = Metrics(metrics_enabled)
+        self.sharded = sharded
+        self.max_samples = max_samples
+        self.live_enrollment = live_enrollment
+        self.last_live_sample = {}
+        self.live_samples = queue.Queue(maxsize=LIVE_ENROLLMENT_QUEUE_SIZE)
+        self.live_sample_thread = None
+        self.model_samples = 0  # samples the recognizer was trained on
+        self.model_max_sample_id = None  # highest of their sample ids
+        self.trained_upto = None  # samples up to this id came from a full face_samples read
+        self.stale_samples = 0  # of those, evicted from face_samples since
+        # Guards the global recognizer's bookkeeping and the swap after a rebuild
+        self.recognizer_lock = threading.Lock()
+        self.rebuild_thread = None
+        self.rebuild_backlog = None  # samples added while a rebuild trains, else None
         self.db = DatabaseHandler()
-        self.face_cascade = cv2.CascadeClassifier(
-            cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
-        )
-        self.face_recognizer = cv2.face_LBPHFaceRecognizer.create()
+        self.attendance_writer = AttendanceWriter(self.db.db_path, metrics=self.metrics)
+        atexit.register(self.attendance_writer.close)
+        atexit.register(self.stop_background_work)
+        self.face_cascade = cv2.CascadeClassifier(HAAR_CASCADE_PATH)
+        self.face_recognizer = create_recognizer(recognizer_backend)
+        self.shards = RecognizerShards(self.db, recognizer_backend)
         self.known_faces = {}
-        self.load_registered_faces()
+        self.student_directory = {}
+        self.load_timings = {}
+        self.face_tracker = FaceTracker()
+        self.detection_scheduler = DetectionScheduler(self.face_cascade, mode=detection_mode)
+        self.visible_tracks = []
+        self.track_overlay = []  # (box, name) of recognized tracks, replaced whole
+        self.frame_index = 0
+        self.tracker_lock = threading.Lock()
+        self.stream_worker = None
+        self.stream_worker_lock = threading.Lock()
+        self.migrate_face_samples()
+        if not self.sharded:
+            self.load_registered_faces()
+        self.student_directory = self.db.fetch_student_directory()
 
     def load_registered_faces(self):
-        self.db.cursor.execute("SELECT student_id, face_image FROM students")
-        registered_faces = self.db.cursor.fetchall()
-        
-        if not registered_faces:
+        self.stale_samples = 0
+        snapshot = self.load_recognizer_snapshot()
+        if snapshot is not None:
+            # Snapshot is current up to its max sample id; only train samples added since
+            snapshot_max_id, sample_count, labels = snapshot
+            self.known_faces = {label: True for label in labels}
+            face_images, labels, self.model_max_sample_id = self.db.fetch_face_samples(snapshot_max_id)
+            self.trained_upto = self.model_max_sample_id
+            self.model_samples = sample_count + len(face_images)
+            if face_images:
+                self.face_recognizer.update(face_images, labels)
+                self.known_faces.update((label, True) for label in labels)
+                self.save_recognizer_snapshot()
             return
 
-        face_images = []
-        labels = []
-        
-        for student_id, face_image in registered_faces:
-            if face_image is not None:
-                # Convert BYTEA to numpy array
-                nparr = np.frombuffer(face_image, np.uint8)
-                img = cv2.imdecode(nparr, cv2.IMREAD_GRAYSCALE)
-                
-                faces = self.face_cascade.detectMultiScale(img)
-                if len(faces) > 0:
-                    (x, y, w, h) = faces[0]
-                    face_roi = img[y:y+h, x:x+w]
-                    face_images.append(face_roi)
-                    labels.append(student_id)
-                    self.known_faces[student_id] = True
+        # Full rebuild from the stored face crops, no detection needed
+        recognizer = create_recognizer(self.face_recognizer.name)
+        face_images, labels, max_sample_id = self.db.fetch_face_samples()
+        if face_images:
+            recognizer.train(face_images, labels)
+        self.face_recognizer = recognizer
+        self.known_faces = {label: True for label in labels}
+        self.model_samples = len(face_images)
+        self.model_max_sample_id = self.trained_upto = max_sample_id
 
         if face_images:
-            self.face_recognizer.train(face_images, np.array(labels))
+            self.save_recognizer_snapshot()
 
-    def register_student(self, name: str, email: str, image_path: str) -> int:
-        # Read and process the image
-        img = cv2.imread(image_path)
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        
-        faces = self.face_cascade.detectMultiScale(gray)
-        if not len(faces):
+    def migrate_face_samples(self):
+        """One-time backfill of face_samples from the stored registration photos"""
+        if self.db.get_schema_version() >= SCHEMA_VERSION_FACE_SAMPLES:
+            return
+
+        # Dedicated cursor so the photos are streamed in chunks, not fetched at once
+        photo_cursor = self.db.conn.cursor()
+        photo_cursor.execute("""
+            SELECT s.student_id, s.face_image
+            FROM students s
+            WHERE s.face_image IS NOT NULL
+            AND NOT EXISTS (
+                SELECT 1 FROM face_samples f WHERE f.student_id = s.student_id
+            )
+            ORDER BY s.student_id
+        """)
+        face_images, labels, self.load_timings = load_training_faces(
+            photo_cursor, self.face_cascade
+        )
+        photo_cursor.close()
+
+        for student_id, face_roi in zip(labels, face_images):
+            self.db.add_face_sample(student_id, face_roi)
+        self.db.set_schema_version(SCHEMA_VERSION_FACE_SAMPLES)
+        self.db.conn.commit()
+
+    def load_recognizer_snapshot(self):
+        """Read the persisted recognizer if it still matches the students table"""
+        snapshot_path = self.face_recognizer.snapshot_path
+        if not (os.path.exists(snapshot_path) and os.path.exists(RECOGNIZER_META_PATH)):
+            return None
+
+        try:
+            with open(RECOGNIZER_META_PATH) as f:
+                meta = json.load(f)
+            max_id = meta['max_sample_id']
+            row_count = meta['sample_count']
+
+            # Snapshots from another backend or crop size are not comparable
+            if (meta.get('backend') != self.face_recognizer.name or
+                    meta.get('face_size') != list(FACE_SAMPLE_SIZE)):
+                return None
+
+            # Any evicted or rewritten sample at or below max_id invalidates the snapshot
+            if self.db.get_samples_fingerprint(max_id) != (max_id, row_count):
+                return None
+
+            self.face_recognizer.read(snapshot_path)
+        except (OSError, ValueError, KeyError, TypeError, cv2.error):
+            return None
+
+        return max_id, row_count, meta['labels']
+
+    def save_recognizer_snapshot(self):
+        """Persist the trained recognizer tagged with the fingerprint of the samples it holds
+
+        The fingerprint is what the model was trained or updated with, not the
+        table's current state, so samples another process added since are
+        detected at load instead of being claimed by the snapshot.
+        """
+        with self.recognizer_lock:
+            # A model still holding evicted samples does not match any fingerprint
+            if not self.known_faces or self.stale_samples:
+                return
+
+            recognizer = self.face_recognizer
+            max_id, row_count = self.model_max_sample_id, self.model_samples
+            snapshot_path = recognizer.snapshot_path
+            tmp_model_path = snapshot_path + '.tmp'
+            tmp_meta_path = RECOGNIZER_META_PATH + '.tmp'
+
+            recognizer.write(tmp_model_path)
+            with open(tmp_meta_path, 'w') as f:
+                json.dump({
+                    'max_sample_id': max_id,
+                    'sample_count': row_count,
+                    'backend': recognizer.name,
+                    'face_size': list(FACE_SAMPLE_SIZE),
+                    'labels': sorted(self.known_faces)
+                }, f)
+
+        # Replace the model first: a crash in between leaves an older fingerprint,
+        # which only causes the newer students to be re-applied with update()
+        os.replace(tmp_model_path, snapshot_path)
+        os.replace(tmp_meta_path, RECOGNIZER_META_PATH)
+
+    def add_to_recognizers(self, faces, labels, sections, sample_ids):
+        """Teach newly stored samples to the global recognizer and any loaded section shards"""
+        if not self.sharded:
+            self.add_to_global_recognizer(faces, labels, sample_ids)
+        self.shards.add(faces, labels, sections)
+
+    def add_to_global_recognizer(self, faces, labels, sample_ids):
+        with self.recognizer_lock:
+            if self.rebuild_backlog is not None:
+                # The rebuild in progress may have read these already; it sorts them out at the swap
+                self.rebuild_backlog.extend(zip(faces, labels, sample_ids))
+
+            # Samples a full face_samples read already trained must not be added twice
+            new = [
+                (face, label, sample_id) for face, label, sample_id in zip(faces, labels, sample_ids)
+                if self.trained_upto is None or sample_id > self.trained_upto
+            ]
+            if not new:
+                return
+            faces, labels, sample_ids = (list(column) for column in zip(*new))
+
+            if len(self.known_faces) > 0:
+                self.face_recognizer.update(faces, labels)
+            else:
+                self.face_recognizer.train(faces, labels)
+            self.known_faces.update((label, True) for label in labels)
+            self.model_samples += len(faces)
+            self.model_max_sample_id = max([self.model_max_sample_id or 0] + sample_ids)
+
+    def stop_background_work(self, timeout=ATTENDANCE_CLOSE_TIMEOUT):
+        """Let queued live samples and a running recognizer rebuild finish before exit"""
+        if self.live_sample_thread is not None and self.live_sample_thread.is_alive():
+            self.live_samples.put(None)
+            self.live_sample_thread.join(timeout)
+        if self.rebuild_thread is not None:
+            self.rebuild_thread.join(timeout)
+
+    def start_recognizer_rebuild(self):
+        """Rebuild the global recognizer on a background thread unless one is already running"""
+        with self.recognizer_lock:
+            if self.rebuild_thread is not None and self.rebuild_thread.is_alive():
+                return
+            self.rebuild_backlog = []
+            self.rebuild_thread = threading.Thread(
+                target=self.rebuild_recognizer, name='recognizer-rebuild', daemon=True
+            )
+            self.rebuild_thread.start()
+
+    def rebuild_recognizer(self):
+        """Retrain the global recognizer from face_samples and swap it in with one assignment
+
+        Recognition keeps using the old, fully trained model until the swap.
+        Samples added while the new one trains are applied to it before the swap.
+        """
+        try:
+            with self.recognizer_lock:
+                stale_before = self.stale_samples
+            recognizer = create_recognizer(self.face_recognizer.name)
+            face_images, labels, max_sample_id = self.db.fetch_face_samples()
+            if face_images:
+                recognizer.train(face_images, labels)
+
+            with self.recognizer_lock:
+                backlog = [
+                    (face, label, sample_id) for face, label, sample_id in self.rebuild_backlog
+                    if max_sample_id is None or sample_id > max_sample_id
+                ]
+                if backlog:
+                    backlog_faces, backlog_labels, backlog_ids = (list(column) for column in zip(*backlog))
+                    if face_images:
+                        recognizer.update(backlog_faces, backlog_labels)
+                    else:
+                        recognizer.train(backlog_faces, backlog_labels)
+                    labels = labels + backlog_labels
+                    max_sample_id = max([max_sample_id or 0] + backlog_ids)
+
+                self.face_recognizer = recognizer
+                self.known_faces = {label: True for label in labels}
+                self.model_samples = len(labels)
+                self.model_max_sample_id = max_sample_id
+                self.trained_upto = max_sample_id
+                self.stale_samples -= stale_before
+        finally:
+            with self.recognizer_lock:
+                self.rebuild_backlog = None
+        self.metrics.increment('recognizer_rebuilds')
+        self.save_recognizer_snapshot()
+
+    def recognizer_for(self, section=None):
+        """Recognizer to match against: a section's shard, or the global one without a section"""
+        section = normalize_section(section)
+        if section is None and not self.sharded:
+            return self.face_recognizer if self.known_faces else None
+        return self.shards.get(section)
+
+    def register_student(self, name: str, email: str, image, section=None) -> int:
+        """Register a student from one or more photos
+
+        Each photo may be a file path, encoded bytes, a PIL image or an RGB array.
+        The first photo is stored on the student; every photo with a detected
+        face becomes a sample, up to max_samples.
+        """
+        section = normalize_section(section)
+        images = image if isinstance(image, (list, tuple)) else [image]
+
+        face_bytes = None
+        face_rois = []
+        for index, photo in enumerate(images):
+            # Decode once to grayscale; face_bytes is what gets stored
+            gray, encoded = load_registration_image(photo)
+            if index == 0:
+                face_bytes = encoded
+
+            faces = self.face_cascade.detectMultiScale(gray)
+            if len(faces):
+                # Get the first detected face
+                (x, y, w, h) = faces[0]
+                face_rois.append(normalize_face(gray[y:y+h, x:x+w]))
+
+        if not face_rois:
             raise ValueError("No face detected in the image")
-            
-        # Get the first detected face
-        (x, y, w, h) = faces[0]
-        face_roi = gray[y:y+h, x:x+w]
-        
-        # Convert image to BYTEA for storage
-        _, img_encoded = cv2.imencode('.jpg', img)
-        face_bytes = img_encoded.tobytes()
+
+        # Keep the photos that survive eviction when there are more than the budget
+        if len(face_rois) > self.max_samples:
+            evicted = set(eviction_order(
+                [(index, 'registration', face) for index, face in enumerate(face_rois)]
+            )[:len(face_rois) - self.max_samples])
+            face_rois = [face for index, face in enumerate(face_rois) if index not in evicted]
         
         # Store in database
         self.db.cursor.execute("""
-            INSERT INTO students (name, email, face_image)
-            VALUES (?, ?, ?)
-        """, (name, email, face_bytes))
+            INSERT INTO students (name, email, face_image, section)
+            VALUES (?, ?, ?, ?)
+        """, (name, email, face_bytes, section))
         
         # Get the last inserted id
         student_id = self.db.cursor.lastrowid
+        sample_ids = [self.db.add_face_sample(student_id, face_roi) for face_roi in face_rois]
         self.db.conn.commit()
         
         # Update face recognizer
-        if len(self.known_faces) > 0:
-            self.face_recognizer.update([face_roi], np.array([student_id]))
-        else:
-            self.face_recognizer.train([face_roi], np.array([student_id]))
-        
-        self.known_faces[student_id] = True
+        self.add_to_recognizers(
+            face_rois, [student_id] * len(face_rois), [section] * len(face_rois), sample_ids
+        )
+        self.student_directory[student_id] = {'name': name, 'email': email, 'section': section}
         return student_id
 
-    def process_image_for_attendance(self, image, is_webcam=False):
-        """Process either webcam frame or uploaded image for attendance"""
+    def bulk_register_students(self, photo_source, roster_path, workers=None,
+                               chunk_size=BULK_CHUNK_SIZE):
+        """Enroll a CSV roster (name, email, photo[, section]) from a folder or zip of photos
+
+        Faces are detected in parallel before anything is written; only the crops
+        are kept. The photos are then re-read and every student is inserted in one
+        short transaction, so SQLite's write lock is not held during detection.
+        The recognizer is trained once at the end. Returns one result per roster
+        row with the photo, name, status ('enrolled' or 'failed') and detail.
+        """
+        roster = read_roster(roster_path)
+        results = [None] * len(roster)
+
+        def result(index, status, detail):
+            entry = roster[index]
+            results[index] = {
+                'photo': entry['photo'], 'name': entry['name'],
+                'status': status, 'detail': detail
+            }
+
+        new_faces = []
+        new_labels = []
+        new_sections = []
+        new_sample_ids = []
+        new_students = {}
+        with open_photo_source(photo_source) as read_photo:
+            def photo_chunks():
+                chunk = []
+                for index, entry in enumerate(roster):
+                    try:
+                        chunk.append((index, read_photo(entry['photo'])))
+                    except (KeyError, OSError):
+                        result(index, 'failed', "Photo not found")
+                        continue
+                    if len(chunk) == chunk_size:
+                        yield chunk
+                        chunk = []
+                if chunk:
+                    yield chunk
+
+            # Detection first, outside any transaction; a 100x100 crop per student is all that is kept
+            detected = []
+            for _, crops, failures in detect_faces_parallel(photo_chunks(), self.face_cascade, workers):
+                for index, reason in failures:
+                    result(index, 'failed', reason)
+                detected.extend(crops)
+
+            try:
+                for index, face_roi in detected:
+                    entry = roster[index]
+                    section = normalize_section(entry.get('section'))
+                    try:
+                        photo = read_photo(entry['photo'])
+                    except (KeyError, OSError):
+                        result(index, 'failed', "Photo not found")
+                        continue
+                    # The uploaded file is stored as-is, no re-encode
+                    self.db.cursor.execute("""
+                        INSERT INTO students (name, email, face_image, section)
+                        VALUES (?, ?, ?, ?)
+                    """, (entry['name'], entry['email'], photo, section))
+                    student_id = self.db.cursor.lastrowid
+                    new_sample_ids.append(self.db.add_face_sample(student_id, face_roi))
+                    new_faces.append(face_roi)
+                    new_labels.append(student_id)
+                    new_sections.append(section)
+                    new_students[student_id] = {
+                        'name': entry['name'], 'email': entry['email'], 'section': section
+                    }
+                    result(index, 'enrolled', f"ID: {student_id}")
+                self.db.conn.commit()
+            except Exception:
+                self.db.conn.rollback()
+                raise
+
+        # Train once for the whole intake
+        if new_faces:
+            self.add_to_recognizers(new_faces, new_labels, new_sections, new_sample_ids)
+            self.student_directory.update(new_students)
+            self.save_recognizer_snapshot()
+
+        return results
+
+    def bulk_register_students_gradio(self, photo_archive, roster_file):
+        """Gradio-compatible method for bulk enrollment"""
+        if photo_archive is None or roster_file is None:
+            return "Please upload both a photo archive and a roster CSV"
+        try:
+            results = self.bulk_register_students(photo_archive, roster_file)
+            return format_enrollment_report(results)
+        except Exception as e:
+            return f"Bulk enrollment failed: {str(e)}"
+
+    def process_recording_for_attendance(self, source, sample_fps=BATCH_SAMPLE_FPS,
+                                         start_time=None, workers=None,
+                                         chunk_size=BATCH_CHUNK_SIZE, section=None):
+        """Mark attendance from a recorded video file or a folder of snapshots
+
+        Sampled frames are detected and recognized in worker processes with a
+        bounded number of chunks in flight, so memory does not grow with the
+        recording's length. Each student is marked once per day, at the timestamp
+        of the first frame they were recognized in; an existing check-in is only
+        moved earlier and check-out is never set, so re-runs are harmless. With a section only that
+        section's students are matched. Returns a summary dict.
+        """
+        if os.path.isdir(source):
+            frames = read_image_folder(source)
+        else:
+            frames = read_video_frames(source, sample_fps, start_time)
+
+        def frame_chunks():
+            chunk = []
+            for frame in frames:
+                chunk.append(frame)
+                if len(chunk) == chunk_size:
+                    yield chunk
+                    chunk = []
+            if chunk:
+                yield chunk
+
+        summary = {'frames': 0, 'faces': 0, 'events': []}
+        recognizer = self.recognizer_for(section)
+        if recognizer is None:
+            return summary
+
+        workers = workers or os.cpu_count() or 1
+        seen = set()
+        with tempfile.TemporaryDirectory() as workdir:
+            # Workers load their own copy of the current model
+            model_path = os.path.join(workdir, os.path.basename(recognizer.snapshot_path))
+            if workers > 1:
+                recognizer.write(model_path)
+
+            for chunk, results in map_chunks_parallel(
+                    recognize_frame_chunk, frame_chunks(), workers,
+                    _init_recognition_worker,
+                    (recognizer.name, model_path, recognizer.threshold),
+                    {'face_cascade': self.face_cascade, 'recognizer': recognizer}):
+                for (timestamp, _), (face_count, labels) in zip(chunk, results):
+                    summary['frames'] += 1
+                    summary['faces'] += face_count
+                    for student_id in labels:
+                        key = (student_id, timestamp.date())
+                        if key in seen:
+                            continue
+                        seen.add(key)
+                        self.mark_attendance(student_id, timestamp, offline=True)
+                        student = self.get_student(student_id)
+                        summary['events'].append({
+                            'student_id': student_id,
+                            'name': student['name'] if student else None,
+                            'check_in': timestamp.strftime('%Y-%m-%d %H:%M:%S')
+                        })
+
+        self.attendance_writer.flush()
+        return summary
+
+    def process_image_for_attendance(self, image, is_webcam=False, section=None):
+        """Process either webcam frame or uploaded image for attendance
+
+        Uploads may be a PIL image or RGB array (annotated and returned in RGB) or
+        encoded bytes (decoded and returned in BGR). Webcam frames are used as given.
+        With a section, faces are matched only against that section's shard.
+        """
         if image is None:
             return None
         
-        # Convert PIL Image to cv2 format if it's not from webcam
-        if not is_webcam:
-            image = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
-        
-        # Convert to grayscale
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        faces = self.face_cascade.detectMultiScale(gray)
+        started = time.perf_counter()
+        # Convert to grayscale in a single color conversion
+        with self.metrics.stage('color_convert'):
+            if isinstance(image, (bytes, bytearray, memoryview)):
+                image = cv2.imdecode(np.frombuffer(image, np.uint8), cv2.IMREAD_COLOR)
+                if image is None:
+                    return None, "Could not decode the image"
+                gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            elif is_webcam:
+                gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            else:
+                if isinstance(image, Image.Image):
+                    # Writable copy, since the annotations are drawn onto it
+                    image = np.array(image.convert('RGB'))
+                gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+
+        with self.metrics.stage('detect'):
+            faces = self.face_cascade.detectMultiScale(gray)
+        self.metrics.observe_faces(len(faces))
         
+        # All faces in the frame are matched in one recognizer call
+        face_rois = [normalize_face(gray[y:y+h, x:x+w]) for (x, y, w, h) in faces]
+        matches = self.recognize_faces(face_rois, section)
+
         attendance_marked = False
-        for (x, y, w, h) in faces:
-            face_roi = gray[y:y+h, x:x+w]
-            
-            if len(self.known_faces) > 0:
-                label, confidence = self.face_recognizer.predict(face_roi)
-                
-                if confidence < 100:  # Adjust threshold as needed
-                    student_id = label
+        with self.metrics.stage('annotate'):
+            for (x, y, w, h), match in zip(faces, matches):
+                if match is not None:
+                    student_id, student_name = match
                     self.mark_attendance(student_id)
                     attendance_marked = True
-                    
-                    # Get student name
-                    self.db.cursor.execute(
-                        "SELECT name FROM students WHERE student_id = ?",
-                        (student_id,)
-                    )
-                    student_name = self.db.cursor.fetchone()[0]
-                    
-                    # Draw rectangle and name
-                    cv2.rectangle(image, (x, y), (x+w, y+h), (0, 255, 0), 2)
-                    cv2.putText(image, f"{student_name}", (x, y-10),
-                              cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
-        
+                    self.draw_student(image, (x, y, w, h), student_name)
+
+        self.metrics.increment('photos')
+        self.metrics.observe('photo', time.perf_counter() - started)
         return image, "Attendance marked successfully!" if attendance_marked else "No registered face detected"
 
-    def process_webcam_frame(self, frame):
-        """Process webcam frame"""
-        marked_frame, _ = self.process_image_for_attendance(frame, is_webcam=True)
-        return marked_frame
+    def recognize_faces(self, face_rois, section=None):
+        """Return (student_id, name) per normalized face crop, or None where unknown"""
+        if len(face_rois) == 0:
+            return []
+        with self.metrics.stage('shard_load'):
+            recognizer = self.recognizer_for(section)
+        if recognizer is None:
+            return [None] * len(face_rois)
 
-    def mark_attendance(self, student_id):
-        # Check if student already has attendance for today
-        self.db.cursor.execute("""
-            SELECT attendance_id, check_in, check_out 
-            FROM attendance 
-            WHERE student_id = ? AND date(attendance_date) = date('now', 'localtime')
-        """, (student_id,))
-        
-        attendance_record = self.db.cursor.fetchone()
-        current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        
-        if attendance_record is None:
-            # Mark check-in
-            self.db.cursor.execute("""
-                INSERT INTO attendance (student_id, check_in)
-                VALUES (?, ?)
-            """, (student_id, current_time))
-        elif attendance_record[2] is None:
-            # Mark check-out
-            self.db.cursor.execute("""
-                UPDATE attendance 
-                SET check_out = ?
-                WHERE attendance_id = ?
-            """, (current_time, attendance_record[0]))
-        
+        with self.metrics.stage('predict'):
+            predictions = recognizer.predict(face_rois)
+
+        threshold = recognizer.threshold
+        matches = []
+        with self.metrics.stage('name_lookup'):
+            for face_roi, (label, distance) in zip(face_rois, predictions):
+                if distance >= threshold:
+                    matches.append(None)
+                    continue
+                student = self.get_student(label)
+                matches.append((label, student['name'] if student else None))
+                if self.live_enrollment and distance < threshold * LIVE_ENROLLMENT_MARGIN:
+                    self.add_live_sample(label, face_roi)
+
+        hits = sum(1 for match in matches if match is not None)
+        self.metrics.increment('recognition_hits', hits)
+        self.metrics.increment('recognition_misses', len(matches) - hits)
+        return matches
+
+    def add_live_sample(self, student_id, face_roi):
+        """Queue a confidently recognized live face to become a sample, rate-limited per student
+
+        The database work runs on the live-enrollment thread, so recognition never
+        writes to SQLite; captures arriving while the queue is full are dropped.
+        """
+        now = time.monotonic()
+        last = self.last_live_sample.get(student_id)
+        if last is not None and now - last < LIVE_ENROLLMENT_INTERVAL:
+            return
+        self.last_live_sample[student_id] = now
+
+        if self.live_sample_thread is None:
+            with self.stream_worker_lock:
+                if self.live_sample_thread is None:
+                    self.live_sample_thread = threading.Thread(
+                        target=self.run_live_enrollment, name='live-enrollment', daemon=True
+                    )
+                    self.live_sample_thread.start()
+        try:
+            self.live_samples.put_nowait((student_id, face_roi))
+        except queue.Full:
+            self.metrics.increment('live_samples_dropped')
+
+    def run_live_enrollment(self):
+        while True:
+            item = self.live_samples.get()
+            try:
+                if item is None:
+                    return
+                self.store_live_sample(*item)
+            except Exception:
+                # Never leave a half-applied eviction for the next sample's commit
+                self.db.conn.rollback()
+                self.metrics.increment('live_sample_errors')
+                logger.exception("Could not store live sample for student %s", item[0])
+            finally:
+                self.live_samples.task_done()
+
+    def store_live_sample(self, student_id, face_roi):
+        """Insert a live capture as a sample, evicting older live ones to stay within max_samples"""
+        victims = self.live_sample_victims(student_id)
+        if victims is None:
+            self.metrics.increment('live_samples_skipped')
+            return
+
+        # Room is made before the insert, so the new capture is never its own victim
+        self.db.delete_face_samples(victims)
+        sample_id = self.db.add_face_sample(student_id, face_roi, source='live')
         self.db.conn.commit()
+        student = self.get_student(student_id)
+        self.add_to_recognizers(
+            [face_roi], [student_id], [student['section'] if student else None], [sample_id]
+        )
+        self.metrics.increment('live_samples')
+        if victims:
+            self.record_evictions(student_id, len(victims))
+
+    def live_sample_victims(self, student_id):
+        """Live samples to evict so one more fits within max_samples, or None if it cannot
+
+        Only older live captures make way; registration photos are never evicted
+        for a live one, so a student whose photos fill the budget gets no live samples.
+        """
+        samples = self.db.fetch_student_samples(student_id)
+        live = [sample for sample in samples if sample[1] == 'live']
+        if len(samples) - len(live) >= self.max_samples:
+            return None
+        excess = len(samples) + 1 - self.max_samples
+        return eviction_order(live)[:excess] if excess > 0 else []
+
+    def record_evictions(self, student_id, excess):
+        """Account for a student's evicted samples in the shard cache and global recognizer"""
+        self.metrics.increment('evicted_samples', excess)
+
+        # A section shard is small enough to retrain on next use
+        student = self.get_student(student_id)
+        self.shards.discard(student['section'] if student else None)
+
+        # The global recognizer keeps evicted samples until enough pile up to justify
+        # a rebuild, which runs in the background so recognition never waits on it
+        if not self.sharded:
+            with self.recognizer_lock:
+                self.stale_samples += excess
+                rebuild = self.stale_samples > self.model_samples * STALE_SAMPLE_FRACTION
+            if rebuild:
+                self.start_recognizer_rebuild()
+
+    def get_student(self, student_id):
+        """Look up a student in the directory cache, reading the DB only on a miss"""
+        student = self.student_directory.get(student_id)
+        if student is None:
+            self.student_directory.update(self.db.fetch_student_directory(student_id))
+            student = self.student_directory.get(student_id)
+        return student
+
+    def draw_student(self, image, box, student_name):
+        # Draw rectangle and name
+        (x, y, w, h) = box
+        cv2.rectangle(image, (x, y), (x+w, y+h), (0, 255, 0), 2)
+        cv2.putText(image, f"{student_name}", (x, y-10),
+                  cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
+
+    def process_webcam_frame(self, frame, section=None):
+        """Process webcam frame, recognizing each tracked face once instead of every frame"""
+        if frame is None:
+            return None
+
+        started = time.perf_counter()
+        with self.tracker_lock:
+            detected = self.detection_scheduler.should_detect()
+            if not detected:
+                # Intermediate frame: reuse the last detection's tracks and labels
+                self.draw_overlay(frame)
+                elapsed = time.perf_counter() - started
+                self.detection_scheduler.record_latency(elapsed, False)
+                self.metrics.increment('frames_skipped')
+                self.metrics.observe('frame_skipped', elapsed)
+                return frame
+
+            with self.metrics.stage('color_convert'):
+                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            self.analyze_webcam_frame(gray, section)
+            self.draw_overlay(frame)
+
+            elapsed = time.perf_counter() - started
+            self.detection_scheduler.record_latency(elapsed, True)
+            self.metrics.increment('frames_detected')
+            self.metrics.observe('frame', elapsed)
+
+        return frame
+
+    def process_webcam_frame_background(self, frame, section=None):
+        """Stream callback that hands the frame to the background worker and returns at once
+
+        The returned frame carries the latest finished results, which may be a
+        few frames old; frames the worker could not keep up with are dropped.
+        """
+        if frame is None:
+            return None
+
+        if self.stream_worker is None:
+            with self.stream_worker_lock:
+                if self.stream_worker is None:
+                    self.stream_worker = LatestFrameWorker(self.analyze_stream_frame, self.metrics)
+
+        # The worker gets its own grayscale copy, so drawing below cannot race with it
+        with self.metrics.stage('color_convert'):
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        self.stream_worker.submit(gray, section)
+        self.draw_overlay(frame)
+        return frame
+
+    def analyze_stream_frame(self, gray, section=None):
+        """Background worker's per-frame step, paced by the detection scheduler
 
-    def register_student_gradio(self, name, email, image):
+        The latency recorded is the worker's own analysis time, not the
+        stream callback's, so the skip interval adapts to what the worker keeps up with.
+        """
+        started = time.perf_counter()
+        with self.tracker_lock:
+            detected = self.detection_scheduler.should_detect()
+            if detected:
+                self.analyze_webcam_frame(gray, section)
+
+            elapsed = time.perf_counter() - started
+            self.detection_scheduler.record_latency(elapsed, detected)
+        if detected:
+            self.metrics.increment('frames_detected')
+            self.metrics.observe('frame', elapsed)
+        else:
+            self.metrics.increment('frames_skipped')
+            self.metrics.observe('frame_skipped', elapsed)
+
+    def analyze_webcam_frame(self, gray, section=None):
+        """Detect, track and recognize faces in a grayscale frame and mark attendance
+
+        The caller holds tracker_lock. Results are published to track_overlay.
+        """
+        with self.metrics.stage('detect'):
+            faces = self.detection_scheduler.detect(gray)
+        self.metrics.observe_faces(len(faces))
+
+        # Tracker time advances only on frames where detection ran
+        self.frame_index += 1
+        with self.metrics.stage('track'):
+            self.visible_tracks = self.face_tracker.update(faces, self.frame_index)
+
+        # Only new or due-for-reverification tracks reach the recognizer, in one batch
+        pending = [
+            track for track in self.visible_tracks
+            if self.face_tracker.needs_recognition(track, self.frame_index)
+        ]
+        face_rois = [
+            normalize_face(gray[y:y+h, x:x+w]) for (x, y, w, h) in
+            (track.box for track in pending)
+        ]
+        for track, match in zip(pending, self.recognize_faces(face_rois, section)):
+            track.last_recognized = self.frame_index
+            if match is not None and match[0] != track.student_id:
+                track.student_id, track.student_name = match
+                track.attendance_marked = False
+
+        for track in self.visible_tracks:
+            # Each track marks attendance at most once
+            if track.student_id is not None and not track.attendance_marked:
+                self.mark_attendance(track.student_id)
+                track.attendance_marked = True
+
+        # Swapped in one assignment so the stream callback never sees a partial list
+        self.track_overlay = [
+            (track.box, track.student_name) for track in self.visible_tracks
+            if track.student_id is not None
+        ]
+
+    def draw_overlay(self, frame):
+        """Draw the most recent recognized tracks onto a frame"""
+        with self.metrics.stage('annotate'):
+            for box, student_name in self.track_overlay:
+                self.draw_student(frame, box, student_name)
+
+    def stream_stats(self):
+        """Background worker throughput, or None before the stream has started"""
+        if self.stream_worker is None:
+            return None
+        return self.stream_worker.stats()
+
+    def diagnostics_summary(self):
+        """Metrics summary plus the attendance writer's backlog and the stream worker's throughput"""
+        report = self.metrics.summary() + "\n\n"
+        writer = self.attendance_writer
+        report += f"💾 Attendance writer: {writer.events.unfinished_tasks} events pending"
+        if writer.last_error is not None:
+            report += f", last error: {writer.last_error}"
+        report += "\n\n"
+
+        stats = self.stream_stats()
+        if stats is None:
+            return report + "🎥 Stream worker: not started"
+        report += "🎥 Stream worker:\n"
+        report += f"Achieved FPS: {stats['fps']:.1f}\n"
+        report += f"Frames: {stats['submitted']} submitted, {stats['processed']} analyzed, "
+        report += f"{stats['dropped']} dropped ({stats['drop_rate'] * 100:.1f}%)\n"
+        report += f"Analysis errors: {stats['errors']}"
+        if stats['last_error'] is not None:
+            report += f", last error: {stats['last_error']}"
+        report += "\n"
+        return report
+
+    def mark_attendance(self, student_id, timestamp=None, offline=False):
+        """Queue a check-in/check-out event; the attendance writer commits it in the background
+
+        Offline events (from recordings) only ever set or move check-in earlier.
+        """
+        self.attendance_writer.submit(student_id, timestamp or datetime.now(), offline)
+
+    def register_student_gradio(self, name, email, image, extra_images=None, section=None):
         """Gradio-compatible method for student registration"""
         try:
-            # Save the uploaded image temporarily
-            temp_path = "temp_upload.jpg"
-            image.save(temp_path)
-            
-            # Register the student
-            student_id = self.register_student(name, email, temp_path)
-            
-            # Clean up
-            os.remove(temp_path)
+            # Register straight from the uploaded files, no temp copy or re-encode
+            student_id = self.register_student(
+                name, email, [image] + list(extra_images or []), section
+            )
             
             return f"Student registered successfully! ID: {student_id}"
         except Exception as e:
             return f"Registration failed: {str(e)}"
 
-    def get_attendance_report(self, date=None):
+    def export_attendance(self, start_date, end_date, export_format='csv',
+                          chunk_size=EXPORT_CHUNK_SIZE):
+        """Write attendance between two YYYY-MM-DD dates (inclusive) to a temp file
+
+        Rows are streamed from SQLite chunk by chunk and appended to a CSV or
+        Parquet file, so memory stays constant whatever the range. Returns the path.
+        """
+        try:
+            start = datetime.strptime(start_date, '%Y-%m-%d').strftime('%Y-%m-%d')
+            end = datetime.strptime(end_date, '%Y-%m-%d').strftime('%Y-%m-%d')
+        except (TypeError, ValueError):
+            raise ValueError("Invalid date. Please use YYYY-MM-DD.")
+        if start > end:
+            raise ValueError("Start date must not be after end date")
+
+        export_format = export_format.lower()
+        if export_format not in ('csv', 'parquet'):
+            raise ValueError(f"Unknown export format: {export_format}")
+        if export_format == 'parquet' and pa is None:
+            raise ValueError("Parquet export requires pyarrow")
+
+        # Include check-ins still waiting in the write-behind queue
+        self.attendance_writer.flush()
+
+        export_file = tempfile.NamedTemporaryFile(
+            prefix=f"attendance_{start}_{end}_", suffix=f".{export_format}", delete=False
+        )
+        export_file.close()
+
+        try:
+            with self.db.read_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT
+                        a.attendance_date,
+                        a.student_id,
+                        s.name,
+                        s.email,
+                        a.check_in,
+                        a.check_out,
+                        CAST(ROUND((julianday(a.check_out) - julianday(a.check_in)) * 1440)
+                             AS INTEGER) as duration_minutes,
+                        CASE
+                            WHEN time(a.check_in) <= time('09:00:00') THEN 'On Time'
+                            WHEN time(a.check_in) <= time('09:30:00') THEN 'Late'
+                            ELSE 'Very Late'
+                        END as status
+                    FROM attendance a
+                    LEFT JOIN students s ON s.student_id = a.student_id
+                    WHERE a.attendance_date BETWEEN ? AND ?
+                    ORDER BY a.attendance_date, a.check_in
+                """, (start, end))
+
+                if export_format == 'csv':
+                    with open(export_file.name, 'w', newline='', encoding='utf-8') as f:
+                        writer = csv.writer(f)
+                        writer.writerow(EXPORT_COLUMNS)
+                        while True:
+                            rows = cursor.fetchmany(chunk_size)
+                            if not rows:
+                                break
+                            writer.writerows(rows)
+                else:
+                    schema = pa.schema([
+                        ('attendance_date', pa.string()), ('student_id', pa.int64()),
+                        ('name', pa.string()), ('email', pa.string()),
+                        ('check_in', pa.string()), ('check_out', pa.string()),
+                        ('duration_minutes', pa.int64()), ('status', pa.string())
+                    ])
+                    # One row group per chunk
+                    with pq.ParquetWriter(export_file.name, schema) as writer:
+                        while True:
+                            rows = cursor.fetchmany(chunk_size)
+                            if not rows:
+                                break
+                            writer.write_table(pa.Table.from_arrays(
+                                [pa.array(column, type=field.type)
+                                 for column, field in zip(zip(*rows), schema)],
+                                schema=schema
+                            ))
+        except Exception:
+            os.remove(export_file.name)
+            raise
+
+        return export_file.name
+
+    def export_attendance_gradio(self, start_date, end_date, export_format):
+        """Gradio-compatible method for attendance export"""
+        try:
+            path = self.export_attendance(start_date, end_date, export_format)
+            return path, f"Exported attendance from {start_date} to {end_date}"
+        except Exception as e:
+            return None, f"Export failed: {str(e)}"
+
+    def get_attendance_report(self, date=None, report_type='Daily'):
         """Generate enhanced attendance report with additional statistics"""
+        # Include check-ins still waiting in the write-behind queue
+        warning = ""
+        try:
+            self.attendance_writer.flush()
+        except (RuntimeError, TimeoutError) as e:
+            # Still report what is committed, but say that some check-ins are missing
+            warning = f"⚠️ Recent check-ins are not saved yet: {str(e)}\n\n"
+
+        # Reports read from the pool so they never contend with the stream's connection
+        with self.db.read_connection() as conn:
+            if report_type in ('Weekly', 'Monthly'):
+                return warning + self.build_period_report(conn.cursor(), date, report_type)
+            return warning + self.build_attendance_report(conn.cursor(), date)
+
+    def build_period_report(self, cursor, date, report_type):
+        """Weekly (7 days ending on date) or monthly report read from the daily rollups"""
+        try:
+            day = datetime.strptime(date, '%Y-%m-%d') if date else datetime.now()
+        except ValueError:
+            return "Invalid date. Please use YYYY-MM-DD."
+
+        if report_type == 'Weekly':
+            start, end = day - timedelta(days=6), day
+        else:
+            last_day = calendar.monthrange(day.year, day.month)[1]
+            start, end = day.replace(day=1), day.replace(day=last_day)
+        start, end = start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d')
+
+        cursor.execute("""
+            SELECT attendance_date, total, on_time, late, very_late, still_present
+            FROM attendance_daily_summary
+            WHERE attendance_date BETWEEN ? AND ? AND total > 0
+            ORDER BY attendance_date
+        """, (start, end))
+        days = cursor.fetchall()
+
+        if not days:
+            return f"No attendance records found between {start} and {end}."
+
+        total = sum(d[1] for d in days)
+        on_time = sum(d[2] for d in days)
+        late = sum(d[3] for d in days)
+        very_late = sum(d[4] for d in days)
+        still_present = sum(d[5] for d in days)
+
+        report = f"📊 {report_type} Attendance Report 📊\n"
+        report += f"Period: {start} to {end}\n"
+        report += "-" * 50 + "\n\n"
+
+        report += "📈 Statistics:\n"
+        report += f"Total Attendances: {total}\n"
+        report += f"Days with Attendance: {len(days)}\n"
+        report += f"Average per Day: {total / len(days):.1f}\n"
+        report += f"On Time: {on_time} ({(on_time/total)*100:.1f}%)\n"
+        report += f"Late: {late} ({(late/total)*100:.1f}%)\n"
+        report += f"Very Late: {very_late} ({(very_late/total)*100:.1f}%)\n"
+        report += f"Not Checked Out: {still_present}\n"
+        report += "-" * 50 + "\n\n"
+
+        report += "📅 Daily Breakdown:\n"
+        report += "Date | Total | On Time | Late | Very Late\n"
+        report += "-" * 50 + "\n"
+        for attendance_date, day_total, day_on_time, day_late, day_very_late, _ in days:
+            report += (f"{attendance_date} | {day_total} | {day_on_time} | "
+                      f"{day_late} | {day_very_late}\n")
+
+        return report
+
+    def build_attendance_report(self, cursor, date=None):
         if date:
-            date_condition = "date(attendance_date) = date(?)"
+            date_condition = "attendance_date = date(?)"
             params = (date,)
         else:
-            date_condition = "date(attendance_date) = date('now', 'localtime')"
+            date_condition = "attendance_date = date('now', 'localtime')"
             params = ()
         
         # Get detailed attendance records
-        self.db.cursor.execute(f"""
+        cursor.execute(f"""
             SELECT 
-                s.name,
+                a.student_id,
                 a.check_in,
                 a.check_out,
                 CASE 
@@ -229,22 +2278,27 @@ class SimpleFaceRecognitionSystem:
                     ELSE 'Very Late'
                 END as status
             FROM attendance a
-            JOIN students s ON a.student_id = s.student_id
             WHERE {date_condition}
             ORDER BY a.check_in
         """, params)
         
-        records = self.db.cursor.fetchall()
+        # Resolve names from the directory cache instead of joining students
+        records = []
+        for student_id, *fields in cursor.fetchall():
+            student = self.get_student(student_id)
+            if student is not None:
+                records.append((student['name'], *fields))
         
         if not records:
             return "No attendance records found for this date."
         
-        # Calculate statistics
-        total_students = len(records)
-        on_time = sum(1 for r in records if r[4] == 'On Time')
-        late = sum(1 for r in records if r[4] == 'Late')
-        very_late = sum(1 for r in records if r[4] == 'Very Late')
-        still_present = sum(1 for r in records if r[2] is None)
+        # Statistics come from the maintained daily rollup, not a pass over the rows
+        cursor.execute(f"""
+            SELECT total, on_time, late, very_late, still_present
+            FROM attendance_daily_summary
+            WHERE {date_condition}
+        """, params)
+        total_students, on_time, late, very_late, still_present = cursor.fetchone()
         
         # Format the detailed report
         report = "📊 Attendance Report Summary 📊\n"
@@ -280,20 +2334,22 @@ class SimpleFaceRecognitionSystem:
         
         # Add weekly/monthly statistics if available
         report += "\n📅 Weekly Statistics:\n"
-        self.db.cursor.execute("""
+        cursor.execute("""
             SELECT 
-                COUNT(*) as total_attendance,
-                SUM(CASE WHEN time(check_in) <= time('09:00:00') THEN 1 ELSE 0 END) as on_time
-            FROM attendance
-            WHERE date(attendance_date) >= date('now', '-7 days')
+                COALESCE(SUM(total), 0) as total_attendance,
+                COALESCE(SUM(on_time), 0) as on_time
+            FROM attendance_daily_summary
+            WHERE attendance_date >= date('now', '-7 days')
         """)
-        weekly_stats = self.db.cursor.fetchone()
+        weekly_stats = cursor.fetchone()
         report += f"Past 7 days: {weekly_stats[1]} on-time out of {weekly_stats[0]} total attendances\n"
         
         return report
 
 def create_gradio_interface():
     face_system = SimpleFaceRecognitionSystem()
+    if face_system.metrics.enabled and METRICS_PORT:
+        serve_metrics(face_system.metrics, METRICS_PORT)
     
     with gr.Blocks(title="Face Recognition Attendance System") as interface:
         gr.Markdown("# Face Recognition Attendance System")
@@ -303,19 +2359,43 @@ def create_gradio_interface():
                 with gr.Column():
                     name_input = gr.Textbox(label="Student Name")
                     email_input = gr.Textbox(label="Student Email")
-                    image_input = gr.Image(label="Student Photo", type="pil")
+                    section_input = gr.Textbox(label="Class Section (optional)")
+                    image_input = gr.Image(label="Student Photo", type="filepath")
+                    extra_images_input = gr.File(
+                        label="Extra Photos (optional)", file_count="multiple", type="filepath"
+                    )
                     register_button = gr.Button("Register Student")
                 with gr.Column():
                     register_output = gr.Textbox(label="Registration Status")
             
             register_button.click(
                 fn=face_system.register_student_gradio,
-                inputs=[name_input, email_input, image_input],
+                inputs=[name_input, email_input, image_input, extra_images_input, section_input],
                 outputs=register_output
             )
         
+        with gr.Tab("Bulk Enrollment"):
+            gr.Markdown("### Upload a zip of photos and a CSV roster with name, email and photo columns")
+            with gr.Row():
+                with gr.Column():
+                    photo_archive_input = gr.File(label="Photos (zip)", type="filepath")
+                    roster_input = gr.File(label="Roster (CSV)", type="filepath")
+                    bulk_button = gr.Button("Enroll Students")
+                with gr.Column():
+                    bulk_output = gr.Textbox(label="Enrollment Report", lines=20, max_lines=30)
+
+            bulk_button.click(
+                fn=face_system.bulk_register_students_gradio,
+                inputs=[photo_archive_input, roster_input],
+                outputs=bulk_output
+            )
+        
         with gr.Tab("Mark Attendance"):
             gr.Markdown("### Choose either webcam or upload a photo")
+            attendance_section = gr.Textbox(
+                label="Class Section",
+                placeholder="Leave empty to match every student"
+            )
             
             with gr.Row():
                 with gr.Column():
@@ -325,7 +2405,7 @@ def create_gradio_interface():
                 
                 with gr.Column():
                     gr.Markdown("#### Using Photo")
-                    photo_input = gr.Image(label="Upload Photo", type="pil")
+                    photo_input = gr.Image(label="Upload Photo", type="numpy")
                     mark_button = gr.Button("Mark Attendance")
                     with gr.Row():
                         attendance_output_photo = gr.Image(label="Processed Photo")
@@ -333,15 +2413,18 @@ def create_gradio_interface():
             
             # Webcam stream
             webcam_input.stream(
-                fn=face_system.process_webcam_frame,
-                inputs=webcam_input,
+                fn=(face_system.process_webcam_frame_background if STREAM_BACKGROUND_RECOGNITION
+                    else face_system.process_webcam_frame),
+                inputs=[webcam_input, attendance_section],
                 outputs=attendance_output_webcam
             )
             
             # Photo upload
             mark_button.click(
-                fn=lambda img: face_system.process_image_for_attendance(img, is_webcam=False),
-                inputs=photo_input,
+                fn=lambda img, section: face_system.process_image_for_attendance(
+                    img, is_webcam=False, section=section
+                ),
+                inputs=[photo_input, attendance_section],
                 outputs=[attendance_output_photo, attendance_status]
             )
         
@@ -368,11 +2451,13 @@ def create_gradio_interface():
             download_btn = gr.Button("📥 Download Report")
             
             def download_report(date, report_type):
-                report = face_system.get_attendance_report(date)
-                filename = f"attendance_report_{date or 'today'}.txt"
-                with open(filename, 'w') as f:
+                report = face_system.get_attendance_report(date, report_type)
+                # Temp file rather than the server's working directory
+                with tempfile.NamedTemporaryFile(
+                        'w', prefix=f"attendance_report_{date or 'today'}_",
+                        suffix='.txt', delete=False) as f:
                     f.write(report)
-                return filename
+                return f.name
             
             download_btn.click(
                 fn=download_report,
@@ -382,9 +2467,37 @@ def create_gradio_interface():
             
             report_button.click(
                 fn=face_system.get_attendance_report,
-                inputs=[date_input],
+                inputs=[date_input, report_type],
                 outputs=report_output
             )
+            
+            gr.Markdown("### Export attendance for a date range")
+            with gr.Row():
+                export_start = gr.Textbox(label="From (YYYY-MM-DD)")
+                export_end = gr.Textbox(label="To (YYYY-MM-DD)")
+                export_format = gr.Radio(choices=["CSV", "Parquet"], label="Format", value="CSV")
+                export_button = gr.Button("📤 Export")
+            with gr.Row():
+                export_file = gr.File(label="Export")
+                export_status = gr.Textbox(label="Export Status")
+            
+            export_button.click(
+                fn=face_system.export_attendance_gradio,
+                inputs=[export_start, export_end, export_format],
+                outputs=[export_file, export_status]
+            )
+        
+        with gr.Tab("Diagnostics"):
+            metrics_button = gr.Button("Refresh Metrics")
+            with gr.Row():
+                metrics_summary = gr.Textbox(label="Summary", lines=20, max_lines=30)
+                metrics_output = gr.Textbox(label="Prometheus Metrics", lines=20, max_lines=30)
+            
+            metrics_button.click(
+                fn=lambda: (face_system.diagnostics_summary(), face_system.metrics.render_prometheus()),
+                inputs=None,
+                outputs=[metrics_summary, metrics_output]
+            )
     
     return interface
 
@@ -0,0 +1,25 @@
+import argparse
+import sys
+
+from resource import INGEST_BATCH_SIZE, ResourceMatcher
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-add resources from a JSON lines file")
+    parser.add_argument('source', help="JSON lines file, one resource per line ('-' for stdin)")
+    parser.add_argument('--batch-size', type=int, default=INGEST_BATCH_SIZE,
+                        help="lines embedded, inserted and committed together")
+    args = parser.parse_args()
+
+    matcher = ResourceMatcher()
+    source = sys.stdin if args.source == '-' else open(args.source, encoding='utf-8')
+    try:
+        for report in matcher.ingest_resources(source, args.batch_size):
+            for error in report['errors']:
+                print(f"line {error['line']}: {error['error']}", file=sys.stderr)
+            print(f"{report['processed']} lines | {report['inserted']} added | {report['failed']} failed")
+    finally:
+        if source is not sys.stdin:
+            source.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# Upper bounds of the faces-per-frame histogram buckets
+FACE_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 40)
+
+METRIC_PREFIX = 'attendance'
+
+# Shared do-nothing timer handed out while metrics are disabled
+_DISABLED_TIMER = nullcontext()
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def samples(self, name, labels=''):
+        """Bucket, sum and count lines; labels is e.g. 'stage="detect"'"""
+        prefix = labels + ',' if labels else ''
+        suffix = '{' + labels + '}' if labels else ''
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum{suffix} {self.total}")
+        lines.append(f"{name}_count{suffix} {self.count}")
+        return lines
+
+class StageTimer:
+    """Context manager that records its block's duration in a stage histogram"""
+    __slots__ = ('metrics', 'stage', 'started')
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.stage, time.perf_counter() - self.started)
+        return False
+
+class Metrics:
+    """Per-stage latency histograms and counters for the attendance hot paths
+
+    When disabled every call returns immediately, so instrumented code pays one
+    attribute check (or one shared no-op context manager) per call site.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.stages = {}
+        self.face_counts = Histogram(FACE_COUNT_BUCKETS)
+        self.counters = {}
+        self.gauges = {}
+
+    def stage(self, name):
+        """Time a `with` block as pipeline stage `name`"""
+        if not self.enabled:
+            return _DISABLED_TIMER
+        return StageTimer(self, name)
+
+    def observe(self, stage, seconds):
+        if not self.enabled:
+            return
+        with self.lock:
+            histogram = self.stages.get(stage)
+            if histogram is None:
+                histogram = self.stages[stage] = Histogram(LATENCY_BUCKETS)
+            histogram.observe(seconds)
+
+    def observe_faces(self, count):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.face_counts.observe(count)
+
+    def increment(self, name, amount=1):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def set_gauge(self, name, value):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.gauges[name] = value
+
+    def render_prometheus(self):
+        """All metrics in the Prometheus text exposition format"""
+        if not self.enabled:
+            return "# Metrics are disabled\n"
+
+        with self.lock:
+            lines = []
+            for name in sorted(self.counters):
+                metric = f"{METRIC_PREFIX}_{name}_total"
+                lines.append(f"# TYPE {metric} counter")
+                lines.append(f"{metric} {self.counters[name]}")
+
+            for name in sorted(self.gauges):
+                metric = f"{METRIC_PREFIX}_{name}"
+                lines.append(f"# TYPE {metric} gauge")
+                lines.append(f"{metric} {self.gauges[name]}")
+
+            metric = f"{METRIC_PREFIX}_faces_per_frame"
+            lines.append(f"# HELP {metric} Faces detected per processed frame")
+            lines.append(f"# TYPE {metric} histogram")
+            lines.extend(self.face_counts.samples(metric))
+
+            # One histogram family, labelled by stage
+            metric = f"{METRIC_PREFIX}_stage_seconds"
+            lines.append(f"# HELP {metric} Latency of each processing stage")
+            lines.append(f"# TYPE {metric} histogram")
+            for stage in sorted(self.stages):
+                lines.extend(self.stages[stage].samples(metric, f'stage="{stage}"'))
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """Human-readable mean latency per stage plus the counters"""
+        if not self.enabled:
+            return "Metrics are disabled. Start the system with metrics_enabled=True."
+
+        with self.lock:
+            report = "⏱ Stage Latency (mean / calls):\n"
+            for stage in sorted(self.stages):
+                histogram = self.stages[stage]
+                report += f"{stage}: {histogram.total / histogram.count * 1e3:.2f} ms / {histogram.count}\n"
+            report += "-" * 50 + "\n\n"
+
+            report += "🔢 Counters:\n"
+            for name in sorted(self.counters):
+                report += f"{name}: {self.counters[name]}\n"
+            for name in sorted(self.gauges):
+                report += f"{name}: {self.gauges[name]:.3f}\n"
+            if self.face_counts.count:
+                report += f"faces_per_frame (mean): {self.face_counts.total / self.face_counts.count:.2f}\n"
+        return report
+
+def serve_metrics(metrics, port, host='0.0.0.0'):
+    """Serve render_prometheus() at /metrics from a daemon thread; returns the server"""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != '/metrics':
+                self.send_error(404)
+                return
+            body = metrics.render_prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    return server
@@ -0,0 +1,332 @@
+import logging
+import threading
+
+import cv2
+import numpy as np
+from typing import List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Face crops are resized to this (width, height) before they are stored, trained or matched
+FACE_SAMPLE_SIZE = (100, 100)
+
+# Distance below which LBPH predictions count as a match
+LBPH_THRESHOLD = 100
+
+# Histogram gallery: LBP grid, comparison metric and impostor false-accept rate
+GALLERY_GRID = (8, 8)
+GALLERY_METRIC = 'cosine'
+GALLERY_FALSE_ACCEPT_RATE = 0.01
+# Per-metric threshold until the gallery is large enough to calibrate; chi2 distances
+# run about 150x the cosine ones on the same faces
+GALLERY_DEFAULT_THRESHOLDS = {'cosine': 0.35, 'chi2': 50.0}
+GALLERY_CALIBRATION_SAMPLES = 1000
+GALLERY_MIN_CALIBRATION_LABELS = 50  # smaller galleries keep the default threshold
+GALLERY_RECALIBRATION_GROWTH = 0.1  # update() recalibrates once the gallery grows this much
+GALLERY_CHI2_BLOCK_ELEMENTS = 1 << 24  # bounds the probe x gallery x bins temporary
+
+class RecognizerBackend:
+    """Interface shared by the face recognizers SimpleFaceRecognitionSystem can use
+
+    Faces are normalized grayscale crops. predict() returns the best (label, distance)
+    per face; a face is recognized when its distance is below `threshold`.
+    Implementations are safe to update() on one thread while others predict().
+    """
+    name = None
+    snapshot_path = None
+
+    def __init__(self):
+        self.threshold = None
+        # Reentrant because train() may build on update()
+        self.lock = threading.RLock()
+
+    def train(self, faces, labels):
+        raise NotImplementedError
+
+    def update(self, faces, labels):
+        raise NotImplementedError
+
+    def predict(self, faces) -> List[Tuple[int, float]]:
+        raise NotImplementedError
+
+    def predict_top_k(self, faces, k: int) -> List[List[Tuple[int, float]]]:
+        raise NotImplementedError
+
+    def write(self, path: str):
+        raise NotImplementedError
+
+    def read(self, path: str):
+        raise NotImplementedError
+
+    def identify(self, faces):
+        """Best label per face, or None where the match is rejected"""
+        return [
+            label if distance < self.threshold else None
+            for label, distance in self.predict(faces)
+        ]
+
+class LBPHRecognizer(RecognizerBackend):
+    """OpenCV's LBPH recognizer, which compares each probe to every sample in turn"""
+    name = 'lbph'
+    snapshot_path = 'face_recognizer.yml'
+
+    def __init__(self, threshold=LBPH_THRESHOLD):
+        super().__init__()
+        self.model = cv2.face_LBPHFaceRecognizer.create()
+        self.threshold = threshold
+
+    def train(self, faces, labels):
+        with self.lock:
+            self.model.train(list(faces), np.asarray(labels, dtype=np.int32))
+
+    def update(self, faces, labels):
+        with self.lock:
+            self.model.update(list(faces), np.asarray(labels, dtype=np.int32))
+
+    def predict(self, faces):
+        with self.lock:
+            return [self.model.predict(face) for face in faces]
+
+    def predict_top_k(self, faces, k):
+        results = []
+        with self.lock:
+            for face in faces:
+                collector = cv2.face.StandardCollector_create()
+                self.model.predict_collect(face, collector)
+                results.append(unique_labels(collector.getResults(True), k))
+        return results
+
+    def write(self, path):
+        with self.lock:
+            self.model.write(path)
+
+    def read(self, path):
+        with self.lock:
+            self.model.read(path)
+
+def unique_labels(candidates, k):
+    """First k distinct labels from (label, distance) pairs sorted by distance"""
+    seen = set()
+    results = []
+    for label, distance in candidates:
+        if label not in seen:
+            seen.add(label)
+            results.append((int(label), float(distance)))
+            if len(results) == k:
+                break
+    return results
+
+def uniform_lbp_table():
+    """Map 8-bit LBP codes to 58 uniform patterns plus one bin for the rest"""
+    table = np.full(256, 58, dtype=np.uint8)
+    next_bin = 0
+    for code in range(256):
+        bits = [(code >> i) & 1 for i in range(8)]
+        transitions = sum(bits[i] != bits[(i + 1) % 8] for i in range(8))
+        if transitions <= 2:
+            table[code] = next_bin
+            next_bin += 1
+    return table
+
+class HistogramGalleryRecognizer(RecognizerBackend):
+    """All gallery LBP histograms in one float32 matrix, scored per batch of probes
+
+    Features are uniform-LBP histograms over a grid of cells. With the cosine
+    metric they are square-rooted and L2-normalized (the Hellinger kernel), so
+    a batch of probes is scored with one matrix product.
+    """
+    name = 'gallery'
+    snapshot_path = 'face_gallery.npz'
+    bins = 59
+
+    def __init__(self, face_size=FACE_SAMPLE_SIZE, grid=GALLERY_GRID, metric=GALLERY_METRIC,
+                 threshold=None):
+        super().__init__()
+        if metric not in ('cosine', 'chi2'):
+            raise ValueError(f"Unknown gallery metric: {metric}")
+        self.face_size = face_size
+        self.grid = grid
+        self.metric = metric
+        self.threshold = GALLERY_DEFAULT_THRESHOLDS[metric] if threshold is None else threshold
+        self.calibrated_size = 0  # gallery size at the last calibration attempt
+        self.lbp_table = uniform_lbp_table()
+
+        # LBP codes drop the one-pixel border; precompute each code pixel's cell
+        width, height = face_size
+        rows = np.arange(height - 2) * grid[0] // (height - 2)
+        cols = np.arange(width - 2) * grid[1] // (width - 2)
+        self.cell_ids = (rows[:, None] * grid[1] + cols[None, :]).astype(np.int64)
+        cell_sizes = np.bincount(self.cell_ids.ravel(), minlength=grid[0] * grid[1])
+        self.cell_scale = np.repeat(1.0 / cell_sizes, self.bins).astype(np.float32)
+
+        self.dim = grid[0] * grid[1] * self.bins
+        self.features = np.empty((0, self.dim), dtype=np.float32)
+        self.labels = np.empty(0, dtype=np.int32)
+        self.size = 0
+
+    def extract_features(self, faces):
+        """Uniform-LBP grid histograms for a batch of faces, one row per face"""
+        batch = np.stack([
+            face if face.shape == self.face_size[::-1]
+            else cv2.resize(face, self.face_size, interpolation=cv2.INTER_AREA)
+            for face in faces
+        ]).astype(np.int16)
+
+        center = batch[:, 1:-1, 1:-1]
+        height, width = center.shape[1:]
+        codes = np.zeros(center.shape, dtype=np.uint8)
+        # Neighbours in circular order so the uniform-pattern mapping is meaningful
+        offsets = [(0, 0), (0, 1), (0, 2), (1, 2), (2, 2), (2, 1), (2, 0), (1, 0)]
+        for bit, (dy, dx) in enumerate(offsets):
+            neighbour = batch[:, dy:dy + height, dx:dx + width]
+            codes |= (neighbour >= center).astype(np.uint8) << bit
+        codes = self.lbp_table[codes]
+
+        cells = self.grid[0] * self.grid[1]
+        index = (np.arange(len(batch))[:, None, None] * cells + self.cell_ids) * self.bins
+        index = index + codes
+        histograms = np.bincount(index.ravel(), minlength=len(batch) * self.dim)
+        histograms = histograms.reshape(len(batch), self.dim).astype(np.float32)
+        histograms *= self.cell_scale
+
+        if self.metric == 'cosine':
+            np.sqrt(histograms, out=histograms)
+            histograms /= np.linalg.norm(histograms, axis=1, keepdims=True) + 1e-12
+        return histograms
+
+    def train(self, faces, labels):
+        with self.lock:
+            self.features = np.empty((0, self.dim), dtype=np.float32)
+            self.labels = np.empty(0, dtype=np.int32)
+            self.size = 0
+            self.calibrated_size = 0
+            self.update(faces, labels)
+
+    def update(self, faces, labels):
+        # Feature extraction touches no shared state, so it runs outside the lock
+        new_features = self.extract_features(faces)
+        with self.lock:
+            needed = self.size + len(new_features)
+
+            # Grow geometrically so repeated enrolment stays amortized O(1) per face
+            if needed > len(self.features):
+                capacity = max(needed, 2 * len(self.features), 64)
+                features = np.empty((capacity, self.dim), dtype=np.float32)
+                features[:self.size] = self.features[:self.size]
+                label_store = np.empty(capacity, dtype=np.int32)
+                label_store[:self.size] = self.labels[:self.size]
+                self.features, self.labels = features, label_store
+
+            self.features[self.size:needed] = new_features
+            self.labels[self.size:needed] = labels
+            self.size = needed
+
+            # Enrolments after train() move the impostor distances too
+            if self.size > self.calibrated_size * (1 + GALLERY_RECALIBRATION_GROWTH):
+                self.calibrate_threshold()
+
+    def distances(self, probes):
+        """Distance matrix between probe features and the whole gallery"""
+        gallery = self.features[:self.size]
+        if self.metric == 'cosine':
+            return 1.0 - probes @ gallery.T
+
+        result = np.empty((len(probes), len(gallery)), dtype=np.float32)
+        block_rows = max(1, GALLERY_CHI2_BLOCK_ELEMENTS // (len(probes) * self.dim))
+        for start in range(0, len(gallery), block_rows):
+            block = gallery[start:start + block_rows]
+            diff = probes[:, None, :] - block[None, :, :]
+            total = probes[:, None, :] + block[None, :, :] + 1e-12
+            result[:, start:start + len(block)] = (diff * diff / total).sum(axis=2)
+        return result
+
+    def predict(self, faces):
+        if len(faces) == 0:
+            return []
+        probes = self.extract_features(faces)
+        with self.lock:
+            if self.size == 0:
+                return [(-1, float('inf'))] * len(faces)
+            distances = self.distances(probes)
+            best = distances.argmin(axis=1)
+            return [
+                (int(self.labels[index]), float(distances[row, index]))
+                for row, index in enumerate(best)
+            ]
+
+    def predict_top_k(self, faces, k):
+        if len(faces) == 0:
+            return []
+        probes = self.extract_features(faces)
+        with self.lock:
+            if self.size == 0:
+                return [[] for _ in faces]
+            distances = self.distances(probes)
+
+            # Over-fetch so several samples of one student still leave k distinct labels
+            candidates = min(self.size, k * 4)
+            nearest = np.argpartition(distances, candidates - 1, axis=1)[:, :candidates]
+            results = []
+            for row, indexes in enumerate(nearest):
+                indexes = indexes[np.argsort(distances[row, indexes])]
+                results.append(unique_labels(
+                    zip(self.labels[indexes], distances[row, indexes]), k
+                ))
+        return results
+
+    def calibrate_threshold(self, false_accept_rate=GALLERY_FALSE_ACCEPT_RATE,
+                            samples=GALLERY_CALIBRATION_SAMPLES):
+        """Set the threshold so an impostor's nearest match is accepted at the given rate
+
+        For sampled gallery rows, the nearest sample of a different student plays
+        the impostor; the threshold is that distance's false_accept_rate quantile.
+        """
+        self.calibrated_size = self.size
+        labels = self.labels[:self.size]
+        students = len(np.unique(labels))
+        if students < GALLERY_MIN_CALIBRATION_LABELS:
+            logger.info("Gallery has %d students, fewer than %d; keeping the %s threshold %.3f",
+                        students, GALLERY_MIN_CALIBRATION_LABELS, self.metric, self.threshold)
+            return
+
+        rng = np.random.default_rng(0)
+        rows = rng.choice(self.size, size=min(samples, self.size), replace=False)
+        distances = self.distances(self.features[rows])
+        distances[labels[rows][:, None] == labels[None, :]] = np.inf
+        self.threshold = float(np.quantile(distances.min(axis=1), false_accept_rate))
+
+    def write(self, path):
+        # File object so numpy does not append its own .npz suffix
+        with self.lock, open(path, 'wb') as f:
+            np.savez(
+                f,
+                features=self.features[:self.size],
+                labels=self.labels[:self.size],
+                threshold=self.threshold,
+                metric=self.metric,
+                grid=np.array(self.grid),
+                face_size=np.array(self.face_size)
+            )
+
+    def read(self, path):
+        with np.load(path) as data:
+            if (str(data['metric']) != self.metric or
+                    tuple(data['grid']) != tuple(self.grid) or
+                    tuple(data['face_size']) != tuple(self.face_size)):
+                raise ValueError("Gallery snapshot was built with different settings")
+            features = np.ascontiguousarray(data['features'], dtype=np.float32)
+            labels = data['labels'].astype(np.int32)
+            threshold = float(data['threshold'])
+        with self.lock:
+            self.features, self.labels, self.threshold = features, labels, threshold
+            self.size = self.calibrated_size = len(labels)
+
+RECOGNIZER_BACKENDS = {
+    LBPHRecognizer.name: LBPHRecognizer,
+    HistogramGalleryRecognizer.name: HistogramGalleryRecognizer
+}
+
+def create_recognizer(name: str, **kwargs) -> RecognizerBackend:
+    if name not in RECOGNIZER_BACKENDS:
+        raise ValueError(f"Unknown recognizer backend: {name}")
+    return RECOGNIZER_BACKENDS[name](**kwargs)
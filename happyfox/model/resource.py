@@ -1,96 +1,299 @@
 import torch
 from transformers import BertTokenizer, BertModel
-from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
 import psycopg2
+from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool
+import os
+import json
+import atexit
+import logging
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 from typing import Dict, List
+from embedding_batcher import BATCH_MAX_SIZE, BATCH_MAX_WAIT, MicroBatcher
+from embedding_index import (
+    EMBEDDING_MAGIC, EmbeddingIndex, IVFIndex, decode_embedding, encode_embedding
+)
+
+logger = logging.getLogger(__name__)
+
+# Connections shared by the server's request threads; a request waits while all are borrowed
+DB_POOL_SIZE = 8
+
+# Most matches find_matches returns
+MATCH_TOP_K = 20
+
+# Rows per round trip when loading stored embeddings at startup
+EMBEDDING_LOAD_BATCH = 2000
+REJECTED_IDS_LOGGED = 20  # resource ids named in the rejected-embeddings warning
+
+# Embeddings are stored with a header naming the model that made them; rows from
+# any other model are rejected at load. Storage is float32, float16 or int8 in
+# the database, and separately in the resident exact index. The index stays
+# float32 by default: over 100k vectors float16 halves its memory but searches
+# about 6x slower (209 ms vs 33 ms, numpy widens float16 per block), while int8
+# quarters it at 40 ms with recall@10 of 0.988. Lower INDEX_STORAGE to trade
+# latency or recall for resident memory.
+EMBEDDING_MODEL_ID = 'bert-base-uncased/mean-pool'
+EMBEDDING_DIM = 768
+EMBEDDING_STORAGE = 'float16'
+INDEX_STORAGE = 'float32'
+
+# Concurrent embed() calls (e.g. parallel search requests) share one padded
+# forward pass of up to INFERENCE_MAX_BATCH texts, waiting at most INFERENCE_MAX_WAIT
+INFERENCE_BATCHING = True
+INFERENCE_MAX_BATCH = BATCH_MAX_SIZE
+INFERENCE_MAX_WAIT = BATCH_MAX_WAIT
+
+# Bulk ingestion: JSON lines read, embedded, inserted and committed per chunk
+INGEST_BATCH_SIZE = 256
+INGEST_REQUIRED_FIELDS = ('student_id', 'type', 'name', 'description', 'status')
+
+# Approximate (IVF) search for large catalogs; smaller ones keep the exact index.
+# The IVF index is saved on exit and reused while the catalog fingerprint matches.
+ANN_INDEX = False
+ANN_MIN_RESOURCES = 10000
+ANN_INDEX_PATH = 'resource_ivf.npz'
+
+def parse_resource_line(line):
+    """(student_id, resource_info) from one JSON line; raises ValueError if it is invalid"""
+    if isinstance(line, bytes):
+        line = line.decode('utf-8')
+    record = json.loads(line)
+    if not isinstance(record, dict):
+        raise ValueError("Expected a JSON object")
+    missing = [field for field in INGEST_REQUIRED_FIELDS if record.get(field) in (None, '')]
+    if missing:
+        raise ValueError(f"Missing fields: {', '.join(missing)}")
+    return int(record['student_id']), {
+        'type': str(record['type']),
+        'name': str(record['name']),
+        'description': str(record['description']),
+        'status': str(record['status']),
+        'cost': float(record.get('cost') or 0)
+    }
 
 class DatabaseHandler:
-    def _init_(self):
-        self.conn = psycopg2.connect(
+    """Lends each unit of work its own pooled connection
+
+    Concurrent requests never share a cursor or a transaction, so one request's
+    fetch or rollback cannot land in another's.
+    """
+
+    def __init__(self, pool_size=DB_POOL_SIZE):
+        self.pool = ThreadedConnectionPool(
+            1, pool_size,
             dbname="resource_sharing",
             user="your_username",
             password="your_password",
             host="localhost",
             port="5432"
         )
-        self.cursor = self.conn.cursor()
+        # The pool raises instead of waiting when exhausted
+        self.slots = threading.BoundedSemaphore(pool_size)
         self.create_tables()
 
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; its transaction commits on success and rolls back on error"""
+        with self.slots:
+            conn = self.pool.getconn()
+            try:
+                with conn:
+                    yield conn
+            finally:
+                self.pool.putconn(conn)
+
+    @contextmanager
+    def cursor(self):
+        """A cursor on a borrowed connection, for work that is one transaction"""
+        with self.connection() as conn, conn.cursor() as cursor:
+            yield cursor
+
     def create_tables(self):
-        # Create tables if they don't exist
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS students (
-                student_id SERIAL PRIMARY KEY,
-                name VARCHAR(100),
-                email VARCHAR(100),
-                experience_points INTEGER DEFAULT 0
-            )
-        """)
-
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS resources (
-                resource_id SERIAL PRIMARY KEY,
-                type VARCHAR(50),
-                name VARCHAR(100),
-                description TEXT,
-                owner_id INTEGER REFERENCES students(student_id),
-                status VARCHAR(20),
-                cost FLOAT,
-                embedding BYTEA,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                is_available BOOLEAN DEFAULT TRUE
-            )
-        """)
-
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS transactions (
-                transaction_id SERIAL PRIMARY KEY,
-                resource_id INTEGER REFERENCES resources(resource_id),
-                provider_id INTEGER REFERENCES students(student_id),
-                receiver_id INTEGER REFERENCES students(student_id),
-                transaction_type VARCHAR(20),
-                points_earned INTEGER,
-                transaction_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS rewards (
-                reward_id SERIAL PRIMARY KEY,
-                name VARCHAR(100),
-                description TEXT,
-                points_required INTEGER,
-                is_available BOOLEAN DEFAULT TRUE
-            )
-        """)
-        
-        # Insert some default rewards
-        self.cursor.execute("""
-            INSERT INTO rewards (name, description, points_required)
-            VALUES 
-                ('Library Extension', 'Extended library access for 1 month', 100),
-                ('Stationary Discount', '20% off on stationary items', 50),
-                ('Printing Credits', '100 pages free printing', 75)
-            ON CONFLICT DO NOTHING
-        """)
+        with self.cursor() as cursor:
+            # Create tables if they don't exist
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS students (
+                    student_id SERIAL PRIMARY KEY,
+                    name VARCHAR(100),
+                    email VARCHAR(100),
+                    experience_points INTEGER DEFAULT 0
+                )
+            """)
+
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS resources (
+                    resource_id SERIAL PRIMARY KEY,
+                    type VARCHAR(50),
+                    name VARCHAR(100),
+                    description TEXT,
+                    owner_id INTEGER REFERENCES students(student_id),
+                    status VARCHAR(20),
+                    cost FLOAT,
+                    embedding BYTEA,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    is_available BOOLEAN DEFAULT TRUE
+                )
+            """)
+
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS transactions (
+                    transaction_id SERIAL PRIMARY KEY,
+                    resource_id INTEGER REFERENCES resources(resource_id),
+                    provider_id INTEGER REFERENCES students(student_id),
+                    receiver_id INTEGER REFERENCES students(student_id),
+                    transaction_type VARCHAR(20),
+                    points_earned INTEGER,
+                    transaction_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS rewards (
+                    reward_id SERIAL PRIMARY KEY,
+                    name VARCHAR(100),
+                    description TEXT,
+                    points_required INTEGER,
+                    is_available BOOLEAN DEFAULT TRUE
+                )
+            """)
         
-        self.conn.commit()
+            # Insert some default rewards
+            cursor.execute("""
+                INSERT INTO rewards (name, description, points_required)
+                VALUES 
+                    ('Library Extension', 'Extended library access for 1 month', 100),
+                    ('Stationary Discount', '20% off on stationary items', 50),
+                    ('Printing Credits', '100 pages free printing', 75)
+                ON CONFLICT DO NOTHING
+            """)
 
 class ResourceMatcher:
-    def _init_(self):
+    def __init__(self):
         self.tokenizer = BertTokenizer.from_pretrained('bert-base-uncased')
         self.model = BertModel.from_pretrained('bert-base-uncased')
         self.model.eval()
+        self.batcher = None
+        if INFERENCE_BATCHING:
+            self.batcher = MicroBatcher(self.embed_batch, INFERENCE_MAX_BATCH, INFERENCE_MAX_WAIT)
         self.db = DatabaseHandler()
+        self.index = EmbeddingIndex(INDEX_STORAGE)
+        self.rejected_embeddings = 0
+        self.rejected_resource_ids = []
+        self.load_index()
+        if ANN_INDEX:
+            atexit.register(self.save_index)
 
-    def get_bert_embedding(self, text):
-        inputs = self.tokenizer(text, return_tensors="pt", padding=True, truncation=True, max_length=128)
+    def catalog_fingerprint(self):
+        """(max resource_id, count) of the searchable resources"""
+        with self.db.cursor() as cursor:
+            cursor.execute("""
+                SELECT COALESCE(MAX(resource_id), -1), COUNT(*) FROM resources
+                WHERE is_available = TRUE AND embedding IS NOT NULL
+            """)
+            return tuple(cursor.fetchone())
+
+    def load_index(self):
+        """Load the embeddings of every available resource into the resident index"""
+        if ANN_INDEX and os.path.exists(ANN_INDEX_PATH):
+            try:
+                index, fingerprint = IVFIndex.load(ANN_INDEX_PATH)
+            except (OSError, ValueError, KeyError):
+                index, fingerprint = None, None
+            # Any resource added or taken since the save invalidates it
+            if index is not None and fingerprint == self.catalog_fingerprint():
+                self.index = index
+                return
+
+        # Named (server-side) cursor so the catalog is streamed, not fetched at once
+        self.index = EmbeddingIndex(INDEX_STORAGE)
+        self.rejected_embeddings = 0
+        self.rejected_resource_ids = []
+        legacy = []
+        with self.db.connection() as conn, conn.cursor(name='embedding_loader') as cursor:
+            cursor.itersize = EMBEDDING_LOAD_BATCH
+            cursor.execute("""
+                SELECT resource_id, embedding FROM resources
+                WHERE is_available = TRUE AND embedding IS NOT NULL
+            """)
+            for resource_id, embedding in cursor:
+                try:
+                    vector = decode_embedding(embedding, EMBEDDING_MODEL_ID)
+                except ValueError:
+                    vector = self.decode_legacy_embedding(embedding)
+                    if vector is None:
+                        # Another model or format version; needs re-embedding
+                        self.rejected_embeddings += 1
+                        self.rejected_resource_ids.append(resource_id)
+                        continue
+                    legacy.append((self.encode(vector), resource_id))
+                self.index.add(resource_id, vector)
+
+        if self.rejected_embeddings:
+            shown = ', '.join(str(resource_id) for resource_id in self.rejected_resource_ids[:REJECTED_IDS_LOGGED])
+            if self.rejected_embeddings > REJECTED_IDS_LOGGED:
+                shown += ', ...'
+            logger.warning(
+                "%d resources have embeddings from another model or format version and are "
+                "left out of search until re-embedded: %s", self.rejected_embeddings, shown
+            )
+
+        # Rewrite headerless rows in the versioned format
+        if legacy:
+            with self.db.cursor() as cursor:
+                for start in range(0, len(legacy), EMBEDDING_LOAD_BATCH):
+                    cursor.executemany("""
+                        UPDATE resources SET embedding = %s WHERE resource_id = %s
+                    """, legacy[start:start + EMBEDDING_LOAD_BATCH])
+
+        if ANN_INDEX and self.index.size >= ANN_MIN_RESOURCES:
+            self.index = IVFIndex.build(*self.index.dense())
+            self.save_index()
+
+    def save_index(self):
+        """Persist the IVF index tagged with the current catalog fingerprint"""
+        if not isinstance(self.index, IVFIndex):
+            return
+        tmp_path = ANN_INDEX_PATH + '.tmp'
+        self.index.save(tmp_path, self.catalog_fingerprint())
+        os.replace(tmp_path, ANN_INDEX_PATH)
+
+    def embed_batch(self, texts):
+        """Mean-pooled BERT embeddings of several texts from one padded forward pass"""
+        inputs = self.tokenizer(list(texts), return_tensors="pt", padding=True, truncation=True, max_length=128)
         with torch.no_grad():
             outputs = self.model(**inputs)
-            embeddings = outputs.last_hidden_state.mean(dim=1)
-        return embeddings.numpy().tobytes()  # Convert to bytes for storage
+            # Average real tokens only, so padding leaves each row as if embedded alone
+            mask = inputs['attention_mask'].unsqueeze(-1).to(outputs.last_hidden_state.dtype)
+            embeddings = (outputs.last_hidden_state * mask).sum(dim=1) / mask.sum(dim=1)
+        return embeddings.numpy().astype(np.float32)
+
+    def embed(self, text):
+        """Mean-pooled BERT embedding of a text as a float32 vector"""
+        if self.batcher is not None:
+            return self.batcher.embed(text)
+        return self.embed_batch([text])[0]
+
+    def encode(self, vector):
+        """Versioned storage bytes for an embedding from this model"""
+        return encode_embedding(vector, EMBEDDING_MODEL_ID, EMBEDDING_STORAGE)
+
+    def decode_legacy_embedding(self, embedding):
+        """Vector from a headerless raw float32 embedding, or None if it is not one
+
+        Rows written before the versioned format were raw float32 bytes from
+        the same BERT model.
+        """
+        embedding = bytes(embedding)
+        if len(embedding) != EMBEDDING_DIM * 4 or embedding.startswith(EMBEDDING_MAGIC):
+            return None
+        return np.frombuffer(embedding, dtype=np.float32)
+
+    def get_bert_embedding(self, text):
+        return self.encode(self.embed(text))  # Convert to bytes for storage
 
     def calculate_points(self, transaction_type: str, resource_type: str) -> int:
         # Points system
@@ -108,96 +311,178 @@ class ResourceMatcher:
         }
         return points_map.get(transaction_type, {}).get(resource_type, 10)
 
-    def add_resource(self, student_id: int, resource_info: Dict):
-        description = f"{resource_info['type']} {resource_info['name']} {resource_info['description']}"
-        embedding = self.get_bert_embedding(description)
-        
-        self.db.cursor.execute("""
-            INSERT INTO resources (type, name, description, owner_id, status, cost, embedding)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-            RETURNING resource_id
-        """, (
+    def resource_text(self, resource_info: Dict):
+        """Text a resource is embedded from"""
+        return f"{resource_info['type']} {resource_info['name']} {resource_info['description']}"
+
+    def resource_row(self, student_id: int, resource_info: Dict, vector):
+        """Column values for inserting a resource"""
+        return (
             resource_info['type'],
             resource_info['name'],
             resource_info['description'],
             student_id,
             resource_info['status'],
             resource_info.get('cost', 0),
-            embedding
-        ))
-        self.db.conn.commit()
-        return "Resource added successfully!"
+            self.encode(vector)
+        )
 
-    def find_matches(self, query: str, threshold: float = 0.7) -> List[Dict]:
-        query_embedding = self.get_bert_embedding(query)
-        
-        self.db.cursor.execute("""
-            SELECT r.*, s.name as owner_name, s.email
-            FROM resources r
-            JOIN students s ON r.owner_id = s.student_id
-            WHERE r.is_available = TRUE
-        """)
+    def add_resource(self, student_id: int, resource_info: Dict):
+        vector = self.embed(self.resource_text(resource_info))
         
-        resources = self.db.cursor.fetchall()
+        with self.db.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO resources (type, name, description, owner_id, status, cost, embedding)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                RETURNING resource_id
+            """, self.resource_row(student_id, resource_info, vector))
+            resource_id = cursor.fetchone()[0]
+        self.index.add(resource_id, vector)
+        return "Resource added successfully!"
+
+    def ingest_resources(self, lines, batch_size: int = INGEST_BATCH_SIZE):
+        """Add resources from JSON lines in chunked transactions, yielding progress
+
+        Every batch_size lines are embedded in padded batches, written with one
+        multi-row INSERT and committed. A report with the running totals and
+        that chunk's per-line errors is yielded after each chunk, the last one
+        with done=True. Only one chunk is held in memory, whatever the input size.
+        """
+        report = {'processed': 0, 'inserted': 0, 'failed': 0, 'done': False}
+        chunk, errors = [], []
+        for line_number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            report['processed'] += 1
+            try:
+                chunk.append((line_number,) + parse_resource_line(line))
+            except (ValueError, TypeError) as e:
+                errors.append({'line': line_number, 'error': str(e)})
+
+            if len(chunk) + len(errors) >= batch_size:
+                yield self.insert_chunk(chunk, errors, report)
+                chunk, errors = [], []
+
+        final = self.insert_chunk(chunk, errors, report)
+        final['done'] = True
+        yield final
+
+    def insert_chunk(self, chunk, errors, report):
+        """Embed and insert one chunk of parsed lines, updating report in place"""
+        inserted = []
+        if chunk:
+            texts = [self.resource_text(resource_info) for _, _, resource_info in chunk]
+            vectors = np.concatenate([
+                self.embed_batch(texts[start:start + INFERENCE_MAX_BATCH])
+                for start in range(0, len(texts), INFERENCE_MAX_BATCH)
+            ])
+            rows = [
+                self.resource_row(student_id, resource_info, vector)
+                for (_, student_id, resource_info), vector in zip(chunk, vectors)
+            ]
+
+            with self.db.connection() as conn, conn.cursor() as cursor:
+                try:
+                    resource_ids = execute_values(cursor, """
+                        INSERT INTO resources (type, name, description, owner_id, status, cost, embedding)
+                        VALUES %s
+                        RETURNING resource_id
+                    """, rows, page_size=len(rows), fetch=True)
+                    conn.commit()
+                    inserted = [(row[0], vector) for row, vector in zip(resource_ids, vectors)]
+                except psycopg2.Error:
+                    conn.rollback()
+                    # Retry one row per transaction to pin the failure on its lines
+                    for (line_number, _, _), row, vector in zip(chunk, rows, vectors):
+                        try:
+                            cursor.execute("""
+                                INSERT INTO resources (type, name, description, owner_id, status, cost, embedding)
+                                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                                RETURNING resource_id
+                            """, row)
+                            resource_id = cursor.fetchone()[0]
+                            conn.commit()
+                            inserted.append((resource_id, vector))
+                        except psycopg2.Error as e:
+                            conn.rollback()
+                            errors.append({'line': line_number, 'error': str(e).strip()})
+
+        for resource_id, vector in inserted:
+            self.index.add(resource_id, vector)
+        report['inserted'] += len(inserted)
+        report['failed'] += len(errors)
+        return dict(report, errors=sorted(errors, key=lambda error: error['line']))
+
+    def find_matches(self, query: str, threshold: float = 0.7, top_k: int = MATCH_TOP_K) -> List[Dict]:
+        # Score against the resident index; the DB is only read for the winners
+        scored = self.index.search(self.embed(query), top_k, threshold)
+        if not scored:
+            return []
+
+        with self.db.cursor() as cursor:
+            cursor.execute("""
+                SELECT r.resource_id, r.type, r.name, r.description, r.status, r.cost,
+                       r.owner_id, s.name as owner_name, s.email
+                FROM resources r
+                JOIN students s ON r.owner_id = s.student_id
+                WHERE r.resource_id = ANY(%s) AND r.is_available = TRUE
+            """, ([resource_id for resource_id, _ in scored],))
+            resources = {row[0]: row for row in cursor.fetchall()}
+
         matches = []
-        
-        for resource in resources:
-            stored_embedding = np.frombuffer(resource[7])  # embedding column
-            similarity = cosine_similarity(
-                query_embedding.reshape(1, -1),
-                stored_embedding.reshape(1, -1)
-            )[0][0]
-            
-            if similarity > threshold:
-                matches.append({
-                    'resource': {
-                        'id': resource[0],
-                        'type': resource[1],
-                        'name': resource[2],
-                        'description': resource[3],
-                        'status': resource[5],
-                        'cost': resource[6],
-                        'owner_name': resource[9],
-                        'owner_email': resource[10]
-                    },
-                    'similarity': similarity
-                })
-        
-        matches.sort(key=lambda x: x['similarity'], reverse=True)
+        for resource_id, similarity in scored:
+            resource = resources.get(resource_id)
+            if resource is None:
+                continue
+            matches.append({
+                'resource': {
+                    'id': resource[0],
+                    'type': resource[1],
+                    'name': resource[2],
+                    'description': resource[3],
+                    'status': resource[4],
+                    'cost': resource[5],
+                    'owner_id': resource[6],
+                    'owner_name': resource[7],
+                    'owner_email': resource[8]
+                },
+                'similarity': similarity
+            })
         return matches
 
     def process_transaction(self, resource_id: int, provider_id: int, receiver_id: int):
-        # Get resource details
-        self.db.cursor.execute("""
-            SELECT type, status FROM resources WHERE resource_id = %s
-        """, (resource_id,))
-        resource_type, transaction_type = self.db.cursor.fetchone()
-        
-        # Calculate points
-        points = self.calculate_points(transaction_type, resource_type)
+        with self.db.cursor() as cursor:
+            # Get resource details
+            cursor.execute("""
+                SELECT type, status FROM resources WHERE resource_id = %s
+            """, (resource_id,))
+            resource_type, transaction_type = cursor.fetchone()
         
-        # Record transaction
-        self.db.cursor.execute("""
-            INSERT INTO transactions 
-            (resource_id, provider_id, receiver_id, transaction_type, points_earned)
-            VALUES (%s, %s, %s, %s, %s)
-        """, (resource_id, provider_id, receiver_id, transaction_type, points))
+            # Calculate points
+            points = self.calculate_points(transaction_type, resource_type)
         
-        # Update provider's points
-        self.db.cursor.execute("""
-            UPDATE students 
-            SET experience_points = experience_points + %s
-            WHERE student_id = %s
-        """, (points, provider_id))
+            # Record transaction
+            cursor.execute("""
+                INSERT INTO transactions 
+                (resource_id, provider_id, receiver_id, transaction_type, points_earned)
+                VALUES (%s, %s, %s, %s, %s)
+            """, (resource_id, provider_id, receiver_id, transaction_type, points))
         
-        # Mark resource as unavailable
-        self.db.cursor.execute("""
-            UPDATE resources
-            SET is_available = FALSE
-            WHERE resource_id = %s
-        """, (resource_id,))
+            # Update provider's points
+            cursor.execute("""
+                UPDATE students 
+                SET experience_points = experience_points + %s
+                WHERE student_id = %s
+            """, (points, provider_id))
         
-        self.db.conn.commit()
+            # Mark resource as unavailable
+            cursor.execute("""
+                UPDATE resources
+                SET is_available = FALSE
+                WHERE resource_id = %s
+            """, (resource_id,))
+
+        self.index.remove(resource_id)
         return points
 
 def main():
@@ -218,13 +503,13 @@ def main():
             name = input("Enter your name: ")
             email = input("Enter your email: ")
             
-            matcher.db.cursor.execute("""
-                INSERT INTO students (name, email)
-                VALUES (%s, %s)
-                RETURNING student_id
-            """, (name, email))
-            student_id = matcher.db.cursor.fetchone()[0]
-            matcher.db.conn.commit()
+            with matcher.db.cursor() as cursor:
+                cursor.execute("""
+                    INSERT INTO students (name, email)
+                    VALUES (%s, %s)
+                    RETURNING student_id
+                """, (name, email))
+                student_id = cursor.fetchone()[0]
             print(f"Registered successfully! Your ID is: {student_id}")
             
         elif choice == '2':
@@ -270,8 +555,9 @@ def main():
                 print("No matching resources found.")
                 
         elif choice == '4':
-            matcher.db.cursor.execute("SELECT * FROM rewards WHERE is_available = TRUE")
-            rewards = matcher.db.cursor.fetchall()
+            with matcher.db.cursor() as cursor:
+                cursor.execute("SELECT * FROM rewards WHERE is_available = TRUE")
+                rewards = cursor.fetchall()
             print("\nAvailable Rewards:")
             for reward in rewards:
                 print(f"\nID: {reward[0]}")
@@ -284,20 +570,21 @@ def main():
             reward_id = int(input("Enter reward ID: "))
             
             # Check points and redeem
-            matcher.db.cursor.execute("""
-                SELECT s.experience_points, r.points_required, r.name
-                FROM students s, rewards r
-                WHERE s.student_id = %s AND r.reward_id = %s
-            """, (student_id, reward_id))
-            
-            points, required, reward_name = matcher.db.cursor.fetchone()
+            with matcher.db.cursor() as cursor:
+                cursor.execute("""
+                    SELECT s.experience_points, r.points_required, r.name
+                    FROM students s, rewards r
+                    WHERE s.student_id = %s AND r.reward_id = %s
+                """, (student_id, reward_id))
+                
+                points, required, reward_name = cursor.fetchone()
+                if points >= required:
+                    cursor.execute("""
+                        UPDATE students
+                        SET experience_points = experience_points - %s
+                        WHERE student_id = %s
+                    """, (required, student_id))
             if points >= required:
-                matcher.db.cursor.execute("""
-                    UPDATE students
-                    SET experience_points = experience_points - %s
-                    WHERE student_id = %s
-                """, (required, student_id))
-                matcher.db.conn.commit()
                 print(f"Successfully redeemed {reward_name}!")
             else:
                 print("Not enough points!")
@@ -308,5 +595,5 @@ def main():
         else:
             print("Invalid choice!")
 
-if _name_ == "_main_":
+if __name__ == "__main__":
     main()
\ No newline at end of file
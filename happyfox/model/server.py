@@ -1,6 +1,8 @@
-from flask import Flask, request, jsonify
+import json
+
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-from model.resources import ResourceMatcher, DatabaseHandler
+from resource import INGEST_BATCH_SIZE, ResourceMatcher, DatabaseHandler
 
 app = Flask(__name__)
 CORS(app)
@@ -22,6 +24,16 @@ def add_resource():
     )
     return jsonify({'message': result})
 
+@app.route('/bulk_add_resources', methods=['POST'])
+def bulk_add_resources():
+    # Body is JSON lines, one resource per line; read as a stream, never whole
+    batch_size = request.args.get('batch_size', INGEST_BATCH_SIZE, type=int)
+    progress = resource_matcher.ingest_resources(request.stream, batch_size)
+    return Response(
+        stream_with_context(json.dumps(report) + '\n' for report in progress),
+        mimetype='application/x-ndjson'
+    )
+
 @app.route('/search_resources', methods=['GET'])
 def search_resources():
     query = request.args.get('query', '')
@@ -0,0 +1,49 @@
+import cv2
+import numpy as np
+
+from recognizers import FACE_SAMPLE_SIZE
+
+def identity_template(identity):
+    """Deterministic smooth grayscale pattern standing in for one student's face"""
+    rng = np.random.default_rng(identity)
+    coarse = rng.integers(0, 256, (12, 12), dtype=np.uint8)
+    face = cv2.resize(coarse, FACE_SAMPLE_SIZE, interpolation=cv2.INTER_CUBIC)
+    return cv2.GaussianBlur(face, (5, 5), 0)
+
+def synthetic_face(identity, rng, noise=12.0, max_shift=2):
+    """A noisy, slightly shifted capture of an identity's template"""
+    face = identity_template(identity).astype(np.float32)
+    face += rng.normal(0, noise, face.shape)
+    shift = rng.integers(-max_shift, max_shift + 1, size=2)
+    face = np.roll(face, tuple(shift), axis=(0, 1))
+    return np.clip(face, 0, 255).astype(np.uint8)
+
+def drawn_face(identity, size=100):
+    """Grayscale cartoon face the Haar cascade detects, with per-identity proportions"""
+    rng = np.random.default_rng(identity)
+    eye_spread, eye_height, mouth_width = rng.uniform([0.14, 0.36, 0.10], [0.20, 0.42, 0.20])
+    img = np.full((size, size), 200, dtype=np.uint8)
+    c = size // 2
+    cv2.ellipse(img, (c, c + 4), (int(size * .36), int(size * .46)), 0, 0, 360,
+                int(rng.integers(155, 185)), -1)
+    ey, ex = int(size * eye_height), int(size * eye_spread)
+    for side in (-1, 1):
+        cv2.ellipse(img, (c + side * ex, ey), (int(size * .09), int(size * .05)), 0, 0, 360, 40, -1)
+        cv2.line(img, (c + side * ex - size // 10, ey - size // 8),
+                 (c + side * ex + size // 10, ey - size // 8), 60, max(2, size // 30))
+    cv2.line(img, (c, ey + size // 15), (c, int(size * .62)), 120, max(2, size // 40))
+    cv2.ellipse(img, (c, int(size * .74)), (int(size * mouth_width), int(size * .05)),
+                0, 0, 360, 70, -1)
+    return cv2.GaussianBlur(img, (5, 5), 0)
+
+def classroom_frame(identities, cell=130, face=100):
+    """BGR frame with one drawn face per identity on a grid, eight to a row"""
+    cols = min(len(identities), 8)
+    rows = -(-len(identities) // cols)
+    frame = np.full((rows * cell, cols * cell), 200, dtype=np.uint8)
+    margin = (cell - face) // 2
+    for index, identity in enumerate(identities):
+        r, c = divmod(index, cols)
+        frame[r * cell + margin:r * cell + margin + face,
+              c * cell + margin:c * cell + margin + face] = drawn_face(identity, face)
+    return cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
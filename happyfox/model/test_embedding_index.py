@@ -0,0 +1,128 @@
+import numpy as np
+import pytest
+
+from embedding_index import (
+    IVF_COMPACT_FRACTION, EmbeddingIndex, IVFIndex, decode_embedding, encode_embedding,
+    normalize_rows
+)
+
+CATALOG_SIZE = 4000
+DIM = 64
+TOPICS = 40
+NOISE = 1.2
+QUERIES = 100
+K = 10
+NPROBE = 8
+MIN_RECALL = 0.95
+
+def clustered_vectors(count, centers, rng):
+    """Unit vectors scattered around topic centers, like embeddings of a resource catalog"""
+    members = rng.integers(0, len(centers), count)
+    return normalize_rows(centers[members] + rng.normal(scale=NOISE, size=(count, centers.shape[1])))
+
+@pytest.fixture(scope='module')
+def catalog():
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(TOPICS, DIM)).astype(np.float32)
+    vectors = clustered_vectors(CATALOG_SIZE, centers, rng)
+    queries = clustered_vectors(QUERIES, centers, rng)
+    ids = np.arange(1, CATALOG_SIZE + 1)
+    return ids, vectors, queries
+
+def exact_index(ids, vectors):
+    index = EmbeddingIndex()
+    for resource_id, vector in zip(ids, vectors):
+        index.add(int(resource_id), vector)
+    return index
+
+def recall(index, exact, queries):
+    """Mean share of the exact top-k ids that the index also returns"""
+    hits = 0
+    for query in queries:
+        truth = {resource_id for resource_id, _ in exact.search(query, K)}
+        found = {resource_id for resource_id, _ in index.search(query, K)}
+        hits += len(truth & found)
+    return hits / (K * len(queries))
+
+def assert_same_results(results, expected):
+    assert [resource_id for resource_id, _ in results] == [resource_id for resource_id, _ in expected]
+    assert [score for _, score in results] == pytest.approx([score for _, score in expected], abs=1e-5)
+
+def test_ivf_recall_at_fixed_nprobe(catalog):
+    ids, vectors, queries = catalog
+    index = IVFIndex.build(ids, vectors, nprobe=NPROBE)
+    assert index.count == CATALOG_SIZE
+    assert recall(index, exact_index(ids, vectors), queries) >= MIN_RECALL
+
+def test_ivf_probing_every_list_is_exact(catalog):
+    ids, vectors, queries = catalog
+    index = IVFIndex.build(ids, vectors)
+    index.nprobe = len(index.centroids)
+    assert recall(index, exact_index(ids, vectors), queries) == 1.0
+
+def test_ivf_tombstones_and_compaction(catalog):
+    ids, vectors, queries = catalog
+    index = IVFIndex.build(ids, vectors)
+    index.nprobe = len(index.centroids)
+    exact = exact_index(ids, vectors)
+
+    # Just past the compaction threshold, so both the tombstoned and compacted states are seen
+    removed = ids[:int(CATALOG_SIZE * IVF_COMPACT_FRACTION / (1 - IVF_COMPACT_FRACTION)) + 2]
+    for count, resource_id in enumerate(removed, 1):
+        index.remove(int(resource_id))
+        exact.remove(int(resource_id))
+        if count == 1:
+            assert index.tombstones == 1 and index.size == CATALOG_SIZE
+    assert index.tombstones < len(removed)
+    assert index.count == CATALOG_SIZE - len(removed)
+
+    removed = set(removed.tolist())
+    for query in queries:
+        results = index.search(query, K)
+        assert not removed & {resource_id for resource_id, _ in results}
+        assert_same_results(results, exact.search(query, K))
+
+def test_ivf_readd_replaces_vector(catalog):
+    ids, vectors, _ = catalog
+    index = IVFIndex.build(ids, vectors)
+    index.add(int(ids[0]), vectors[1])
+    assert index.count == CATALOG_SIZE
+    assert index.search(vectors[1], 2)[0][1] == pytest.approx(1.0)
+    assert {resource_id for resource_id, _ in index.search(vectors[1], 2)} == {ids[0], ids[1]}
+
+def test_ivf_save_load_round_trip(catalog, tmp_path):
+    ids, vectors, queries = catalog
+    index = IVFIndex.build(ids, vectors, nprobe=NPROBE)
+    for resource_id in ids[:50]:
+        index.remove(int(resource_id))
+    path = str(tmp_path / 'ivf.npz')
+    index.save(path, (CATALOG_SIZE, CATALOG_SIZE - 50))
+
+    restored, fingerprint = IVFIndex.load(path)
+    assert fingerprint == (CATALOG_SIZE, CATALOG_SIZE - 50)
+    assert restored.nprobe == NPROBE
+    assert restored.count == index.count
+    exact = exact_index(ids[50:], vectors[50:])
+    for query in queries:
+        assert_same_results(restored.search(query, K), index.search(query, K))
+    assert recall(restored, exact, queries) >= MIN_RECALL
+
+@pytest.mark.parametrize('storage', ['float16', 'int8'])
+def test_quantized_index_matches_float32(catalog, storage):
+    ids, vectors, queries = catalog
+    exact = exact_index(ids, vectors)
+    compact = EmbeddingIndex(storage)
+    for resource_id, vector in zip(ids, vectors):
+        compact.add(int(resource_id), vector)
+    assert compact.nbytes < exact.nbytes
+    assert recall(compact, exact, queries) >= MIN_RECALL
+
+def test_embedding_blob_round_trip_and_rejection(catalog):
+    _, vectors, _ = catalog
+    blob = encode_embedding(vectors[0], 'test-model', 'float16')
+    assert decode_embedding(blob, 'test-model') == pytest.approx(vectors[0], abs=1e-3)
+
+    with pytest.raises(ValueError):
+        decode_embedding(blob, 'other-model')
+    with pytest.raises(ValueError):
+        decode_embedding(blob[:-1], 'test-model')
@@ -0,0 +1,104 @@
+import threading
+
+import numpy as np
+import pytest
+
+from recognizers import GALLERY_DEFAULT_THRESHOLDS, HistogramGalleryRecognizer, create_recognizer
+from synthetic_faces import synthetic_face
+
+IDENTITIES = 100
+MIN_LABEL_PARITY = 0.99
+
+@pytest.fixture(scope='module')
+def roster():
+    rng = np.random.default_rng(0)
+    labels = list(range(1, IDENTITIES + 1))
+    gallery = [synthetic_face(label, rng) for label in labels]
+    probes = [synthetic_face(label, rng) for label in labels]
+    return gallery, labels, probes
+
+@pytest.mark.parametrize('metric', ['cosine', 'chi2'])
+def test_gallery_labels_match_lbph(roster, metric):
+    gallery, labels, probes = roster
+    lbph = create_recognizer('lbph')
+    lbph.train(gallery, labels)
+    histogram = HistogramGalleryRecognizer(metric=metric)
+    histogram.train(gallery, labels)
+
+    lbph_labels = np.array([label for label, _ in lbph.predict(probes)])
+    gallery_labels = np.array([label for label, _ in histogram.predict(probes)])
+    assert np.mean(lbph_labels == gallery_labels) >= MIN_LABEL_PARITY
+    assert np.mean(gallery_labels == np.array(labels)) >= MIN_LABEL_PARITY
+
+def test_gallery_update_matches_train(roster):
+    gallery, labels, probes = roster
+    trained = HistogramGalleryRecognizer()
+    trained.train(gallery, labels)
+    updated = HistogramGalleryRecognizer()
+    updated.train(gallery[:10], labels[:10])
+    updated.update(gallery[10:], labels[10:])
+
+    assert updated.predict(probes) == pytest.approx(trained.predict(probes))
+    assert updated.threshold == pytest.approx(trained.threshold)
+
+def test_gallery_small_gallery_keeps_metric_default(roster):
+    gallery, labels, _ = roster
+    for metric in ('cosine', 'chi2'):
+        recognizer = HistogramGalleryRecognizer(metric=metric)
+        recognizer.train(gallery[:10], labels[:10])
+        assert recognizer.threshold == GALLERY_DEFAULT_THRESHOLDS[metric]
+
+def test_gallery_top_k_has_distinct_labels(roster):
+    gallery, labels, probes = roster
+    recognizer = HistogramGalleryRecognizer()
+    # Two samples per student so top-k must skip repeated labels
+    recognizer.train(gallery + probes, labels + labels)
+
+    for label, candidates in zip(labels, recognizer.predict_top_k(probes[:10], 5)):
+        candidate_labels = [candidate for candidate, _ in candidates]
+        assert len(candidate_labels) == len(set(candidate_labels)) == 5
+        assert candidate_labels[0] == label
+
+@pytest.mark.parametrize('backend', ['lbph', 'gallery'])
+def test_write_read_round_trip(roster, tmp_path, backend):
+    gallery, labels, probes = roster
+    recognizer = create_recognizer(backend)
+    recognizer.train(gallery, labels)
+    path = str(tmp_path / recognizer.snapshot_path)
+    recognizer.write(path)
+
+    restored = create_recognizer(backend)
+    restored.read(path)
+    assert restored.predict(probes) == pytest.approx(recognizer.predict(probes))
+    if backend == 'gallery':
+        assert restored.threshold == recognizer.threshold
+
+def test_gallery_read_rejects_other_settings(roster, tmp_path):
+    gallery, labels, _ = roster
+    recognizer = HistogramGalleryRecognizer(metric='cosine')
+    recognizer.train(gallery, labels)
+    path = str(tmp_path / 'gallery.npz')
+    recognizer.write(path)
+
+    with pytest.raises(ValueError):
+        HistogramGalleryRecognizer(metric='chi2').read(path)
+
+@pytest.mark.parametrize('backend', ['lbph', 'gallery'])
+def test_predict_while_updating(roster, backend):
+    gallery, labels, probes = roster
+    recognizer = create_recognizer(backend)
+    recognizer.train(gallery[:10], labels[:10])
+
+    def enroll():
+        for start in range(10, len(gallery), 5):
+            recognizer.update(gallery[start:start + 5], labels[start:start + 5])
+    writer = threading.Thread(target=enroll)
+    writer.start()
+    while writer.is_alive():
+        for label, _ in recognizer.predict(probes[:10]):
+            assert label in labels
+    writer.join()
+
+    trained = create_recognizer(backend)
+    trained.train(gallery, labels)
+    assert recognizer.predict(probes) == pytest.approx(trained.predict(probes))